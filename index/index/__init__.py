@@ -4,20 +4,24 @@ import flask
 # app is a single object used by all the code modules in this package
 app = flask.Flask(__name__)  # pylint: disable=invalid-name
 
-# Read settings from config module (insta485/config.py)
-# app.config.from_object('insta485.config')
+# Read settings from config module (index/config.py)
+app.config.from_object('index.config')
 
 # Overlay settings read from a Python file whose path is set in the environment
-# variable INSTA485_SETTINGS. Setting this environment variable is optional.
+# variable INDEX_SETTINGS. Setting this environment variable is optional.
 # Docs: http://flask.pocoo.org/docs/latest/config/
 #
 # EXAMPLE:
-# $ export INSTA485_SETTINGS=secret_key_config.py
-# app.config.from_envvar('INSTA485_SETTINGS', silent=True)
+# $ export INDEX_SETTINGS=config.py
+app.config.from_envvar('INDEX_SETTINGS', silent=True)
 
 # Tell our app about views and model.  This is dangerously close to a
 # circular import, which is naughty, but Flask was designed that way.
 # (Reference http://flask.pocoo.org/docs/patterns/packages/)  We're
 # going to tell pylint and pycodestyle to ignore this coding style violation.
 import index.api  # noqa: E402  pylint: disable=wrong-import-position
-# import insta485.model  # noqa: E402  pylint: disable=wrong-import-position
+import index.model  # noqa: E402  pylint: disable=wrong-import-position
+
+# Load the data files now rather than on the first request, so that no user
+# query pays for it.  /api/v1/ready reports when the server is ready.
+index.model.load()
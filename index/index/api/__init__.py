@@ -1,2 +1,2 @@
 """Initialize module."""
-from index.api.views import first_route, second_route
+from index.api.views import first_route, ready_route, second_route
@@ -1,72 +1,24 @@
 """REST API for index server."""
-import re
-from math import sqrt
-import pathlib
-from flask import jsonify, request
+import collections
+import hmac
+import time
+import numpy as np
+import requests
+from flask import Response, g, jsonify, make_response, request
+from werkzeug.datastructures import MultiDict
 import index
+from index import (blockmax, metrics, model, planner, profiling, querylog,
+                   scoring)
+from index.postings import intersect
 
-# page rank structure
-# {"doc_id1": factor,
-#  "doc_id2": factor,
-#  ...}
-page_rank = {}
-
-# inverted index structure
-# {"item1": {"idf": 123,
-#       "doc_id_x": [occurrence, normalization],
-#       "doc_id_y": [occurrence, normalization], ...,
-#       "document_match": [list of doc_ids]}
-#  "item2": {"idf": 123,
-#       "doc_id_x": [occurrence, normalization],
-#       "doc_id_y": [occurrence, normalization], ...,
-#       "document_match": [list of doc_ids]}}
-
-inverted_index = {}
-
-stop_words = []
-
-
-@index.app.before_first_request
-def before_first_request():
-    """Read in data."""
-    index_package_dir = pathlib.Path(__file__).parent.parent
-    index_dir = pathlib.Path(__file__).parent.parent
-    # print(index_package_dir)
-    # FIX INPUT DIRECTORIES
-    stopwords_filename = index_dir / "stopwords.txt"
-    pagerank_filename = index_dir / "pagerank.out"
-    inverted_index_filename = index_package_dir / "inverted_index.txt"
-    with open(pagerank_filename, mode='r') as page:
-        line = page.readline()
-        while line:
-            line = line.rstrip()
-            line_split = line.split(',')
-            page_rank[line_split[0]] = line_split[1]
-            line = page.readline()
-
-    with open(inverted_index_filename, mode='r') as invert:
-        line = invert.readline()
-        while line:
-            line = line.rstrip()
-            line_split = line.split(' ')
-            inverted_index[line_split[0]] = {
-                "idf": line_split[1]
-            }
-            document_match = []  # doc_ids that have this word
-            for item in range(2, len(line_split), 3):
-                # "doc_id": [occurrence, normalization_factor]
-                inverted_index[line_split[0]][line_split[item]] \
-                    = [line_split[item+1], line_split[item+2]]
-                document_match.append(line_split[item])
-            inverted_index[line_split[0]]["document_match"] = document_match
-            line = invert.readline()
-
-    with open(stopwords_filename, mode='r') as stopwords:
-        line = stopwords.readline()
-        while line:
-            line = line.rstrip()
-            stop_words.append(line)
-            line = stopwords.readline()
+# Values of the mode parameter of /api/v1/hits/: docs with all the query
+# words, or docs with any of them
+QUERY_MODES = ("and", "or")
+
+# Parameters of a hits request, see parse_hits_args()
+HitsArgs = collections.namedtuple(
+    "HitsArgs", ["query", "weight", "mode", "offset", "limit"]
+)
 
 
 @index.app.route('/api/v1/', methods=['GET'])
@@ -79,172 +31,497 @@ def first_route():
     return jsonify(**context)
 
 
+@index.app.route('/api/v1/ready', methods=['GET'])
+def ready_route():
+    """Report whether the index is loaded and warmed up."""
+    data = model.current()
+    if data["coordinator"] is not None:
+        return shards_ready(data["coordinator"])
+    context = dict(model.status)
+    context["terms"] = len(data["inverted_index"])
+    context["documents"] = len(data["doc_table"].docids)
+    context["postings"] = data["inverted_index"].posting_stats()
+    context["result_cache"] = model.result_cache.stats()
+    context["tfidf_cache"] = model.tfidf_cache.stats()
+    return jsonify(**context), 200 if model.status["ready"] else 503
+
+
 @index.app.route('/api/v1/hits/', methods=['GET'])
 def second_route():
     """Handle second route."""
-    weight = request.args.get('w')
-    query = request.args.get('q')
-    query = re.sub(r'[^a-zA-Z0-9 ]+', '', query)
-
-    # Find common doc_id having all the query words
-    query_list = query.split(' ')
-    # Remove stopwords
-    for item in query_list:
-        if item in stop_words:
-            query_list.remove(item)
-
-    query_dict = {}
-    for item in query_list:
-        if item in query_dict:
-            query_dict[item] += 1
+    if not model.status["loaded"]:
+        context = {
+            "message": "Service Unavailable",
+            "status_code": 503
+        }
+        return jsonify(**context), 503
+
+    try:
+        hits_args = parse_hits_args(request.args)
+    except ValueError:
+        context = {
+            "message": "Bad Request",
+            "status_code": 400
+        }
+        return jsonify(**context), 400
+
+    profile = request.args.get('profile', default=0, type=int)
+    if profile and not is_admin():
+        context = {
+            "message": "Forbidden",
+            "status_code": 403
+        }
+        return jsonify(**context), 403
+
+    start = time.perf_counter()
+    response = profiled_hits_response(hits_args, profile)
+    querylog.log(hits_args, time.perf_counter() - start,
+                 g.get("hit_count"), g.get("cache_status", "miss"))
+    return response
+
+
+def profiled_hits_response(hits_args, profile):
+    """Return hits_response(), profiled if asked or sampled.
+
+    profile=1 adds where an admin's request spends its time to the
+    response, and one in PROFILE_SAMPLE_RATE requests is profiled for
+    /api/v1/profiles.
+    """
+    if profile:
+        g.profiling = True
+        response, report = profiling.run(hits_response, [hits_args])
+        response = make_response(response)
+        context = response.get_json()
+        context["profile"] = report
+        return jsonify(**context), response.status_code
+    if profiling.sampled():
+        g.profiling = True
+        response, report = profiling.run(hits_response, [hits_args],
+                                         wait=False)
+        if report is not None:
+            profiling.store(request.full_path, report)
+        return response
+    return hits_response(hits_args)
+
+
+@index.app.route('/api/v1/profiles', methods=['GET'])
+def profiles_route():
+    """Return the reports of the sampled requests, oldest first."""
+    if not is_admin():
+        context = {
+            "message": "Forbidden",
+            "status_code": 403
+        }
+        return jsonify(**context), 403
+    return jsonify(profiles=list(profiling.reports))
+
+
+def hits_response(hits_args):
+    """Return the response of a valid hits request."""
+    # Use the same version of the data for the whole request, even if a
+    # reload swaps in a new one meanwhile
+    data = model.current()
+    if data["coordinator"] is not None:
+        return coordinate(data["coordinator"], hits_args)
+
+    with metrics.timed("parse"):
+        query_plan = planner.plan(hits_args.query, hits_args.mode, data)
+    ranked = cached_rank(data, query_plan, hits_args)
+    with metrics.timed("serialize"):
+        context = hits_context(ranked, hits_args.offset)
+        g.hit_count = len(context["hits"])
+
+        # explain=1 adds the query plan, for latency investigations
+        if request.args.get('explain', default=0, type=int):
+            context["plan"] = planner.explain(query_plan)
+        return jsonify(**context)
+
+
+@index.app.route('/api/v1/hits/batch', methods=['POST'])
+def batch_route():
+    """Return the hits of each query in a JSON list.
+
+    Each query is an object with the parameters of /api/v1/hits/, for
+    example {"q": "world flags", "w": 0.5, "limit": 10}.  The results list
+    has the response of /api/v1/hits/ for each query, in order.  Queries
+    with the same words share the work of finding and scoring the matches.
+    """
+    if not model.status["loaded"]:
+        context = {
+            "message": "Service Unavailable",
+            "status_code": 503
+        }
+        return jsonify(**context), 503
+
+    items = request.get_json(silent=True)
+    if not isinstance(items, list) or \
+            len(items) > index.app.config["HITS_BATCH_MAX"]:
+        context = {
+            "message": "Bad Request",
+            "status_code": 400
+        }
+        return jsonify(**context), 400
+
+    batch = []
+    for item in items:
+        try:
+            batch.append(parse_hits_args(MultiDict(item)))
+        except (TypeError, ValueError):
+            batch.append(None)
+
+    data = model.current()
+    if data["coordinator"] is not None:
+        return coordinate_batch(data["coordinator"], batch)
+
+    # Terms shared by several queries are looked up once
+    lookups = {}
+    queries = [None if hits_args is None else
+               (planner.plan(hits_args.query, hits_args.mode, data, lookups),
+                hits_args)
+               for hits_args in batch]
+    shared = share_matches(data, queries)
+    results = []
+    for query in queries:
+        if query is None:
+            results.append({"message": "Bad Request", "status_code": 400})
         else:
-            query_dict[item] = 1
-    print(query_list)
-
-    result = check_empty(query_list[0], inverted_index)
-    print(result)
-    if result:
-        return jsonify(**result)
-
-    document_match = inverted_index[query_list[0]]['document_match']
-
-    for item in range(1, len(query_list)):
-        # check if the key exists in the inverted index dictionary
-        # if not, return an 'empty' json object
-        new_result = check_empty(query_list[item], inverted_index)
-        if new_result:
-            return new_result
-
-        new_match = inverted_index[query_list[item]]['document_match']
-        document_match = list(set(document_match) & set(new_match))
-
-        # handle results if document match is empty
-        if len(document_match) == 0:
-            empty_context = {
-                "hits": []
-            }
-            return jsonify(**empty_context)
-
-    # #print(document_match)
-    # # Find related page rank
-    # page_rank_dict = {}
-    # for item in document_match:
-    #     page_rank_dict[item] = page_rank[item]
-
-    # Find inverted index idf
-    idf = []
-    for key in query_dict:
-        idf.append(inverted_index[key]["idf"])
-
-    context = calculate_vector(query_dict, weight, document_match, idf)
-
-    # # Sort the context dictionary by value
-    # sorted_context = {}
-    # sorted_keys = sorted(context, key=context.get, reverse=True)
-    # for key in sorted_keys:
-    #     sorted_context[key] = context[key]
-    #
-    # final_context = {
-    #     "hits": []
-    # }
-    # for key in sorted_context:
-    #     instance_dict = {"docid": int(key),
-    #     "score": float(sorted_context[key])}
-    #     final_context["hits"].append(instance_dict)
-    #
-    # #print(final_context)
-    return return_final(context)
-
-
-def return_final(context):
-    """Return final context."""
-    # Sort the context dictionary by value
-    sorted_context = {}
-    sorted_keys = sorted(context, key=context.get, reverse=True)
-    for key in sorted_keys:
-        sorted_context[key] = context[key]
-
-    final_context = {
-        "hits": []
+            ranked = cached_rank(data, *query, shared)
+            results.append(hits_context(ranked, query[1].offset))
+    return jsonify(results=results)
+
+
+@index.app.route('/api/v1/metrics', methods=['GET'])
+def metrics_route():
+    """Report the server metrics in the Prometheus text format."""
+    text = metrics.render(data_gauges(model.current()))
+    return Response(text, content_type="text/plain; version=0.0.4; "
+                                       "charset=utf-8")
+
+
+@index.app.after_request
+def count_request(response):
+    """Count the response in the request metrics."""
+    rule = request.url_rule
+    metrics.requests_total.inc(rule.rule if rule else "unmatched",
+                               response.status_code)
+    return response
+
+
+@index.app.route('/api/v1/reload', methods=['POST'])
+def reload_route():
+    """Load the data files again in the background.
+
+    The current data keeps serving until the new data is swapped in,
+    /api/v1/ready reports the version being served.
+    """
+    if not is_admin():
+        context = {
+            "message": "Forbidden",
+            "status_code": 403
+        }
+        return jsonify(**context), 403
+    if not model.request_reload():
+        context = {
+            "message": "Conflict",
+            "status_code": 409
+        }
+        return jsonify(**context), 409
+    context = {
+        "message": "Accepted",
+        "status_code": 202
     }
-    for key in sorted_context:
-        instance_dict = {"docid": int(key),
-                         "score": float(sorted_context[key])}
-        final_context["hits"].append(instance_dict)
+    return jsonify(**context), 202
 
-    # print(final_context)
-    return jsonify(**final_context)
 
+def is_admin():
+    """Return True if the request may use admin routes.
 
-def dot(list1, list2):
-    """Calculate dot product."""
-    return sum(float(x) * float(y) for x, y in zip(list1, list2))
+    With INDEX_ADMIN_TOKEN set the X-Admin-Token header must match it,
+    otherwise only requests from localhost are allowed.
+    """
+    token = index.app.config["INDEX_ADMIN_TOKEN"]
+    if token is not None:
+        return hmac.compare_digest(
+            request.headers.get("X-Admin-Token", ""), token
+        )
+    return request.remote_addr in ("127.0.0.1", "::1")
+
+
+def data_gauges(data):
+    """Return the gauges of the served data and the caches."""
+    stats = data["inverted_index"].posting_stats()
+    data_bytes = [
+        ("postings", stats["bytes"]),
+        ("doc_table", sum(column.nbytes for column in data["doc_table"])),
+        ("bounds", 0 if data["bounds"] is None else
+         sum(getattr(part, "nbytes", 0) for part in data["bounds"])),
+    ]
+    caches = [("result", model.result_cache.stats()),
+              ("tfidf", model.tfidf_cache.stats())]
+    return [
+        metrics.gauge_lines("index_ready", "1 once the data is loaded.", [
+            ((), model.status["ready"]),
+        ]),
+        metrics.gauge_lines("index_data_version",
+                            "Version of the data served.", [
+                                ((), data["version"]),
+                            ]),
+        metrics.gauge_lines("index_terms", "Terms in the index.", [
+            ((), len(data["inverted_index"])),
+        ]),
+        metrics.gauge_lines("index_documents", "Documents in the index.", [
+            ((), len(data["doc_table"].docids)),
+        ]),
+        metrics.gauge_lines("index_postings", "Postings in the index.", [
+            ((), stats["postings"]),
+        ]),
+        metrics.gauge_lines(
+            "index_memory_bytes", "Bytes of the index data, by part.",
+            [((("part", part),), size) for part, size in data_bytes]
+        ),
+        metrics.gauge_lines(
+            "index_postings_compression_ratio",
+            "Plain posting bytes over stored posting bytes.",
+            [((), stats["compression_ratio"])]
+        ),
+        metrics.gauge_lines(
+            "index_cache_hits", "Lookups served by a cache.",
+            [((("cache", name),), cache["hits"]) for name, cache in caches]
+        ),
+        metrics.gauge_lines(
+            "index_cache_misses", "Lookups a cache could not serve.",
+            [((("cache", name),), cache["misses"]) for name, cache in caches]
+        ),
+        metrics.gauge_lines(
+            "index_cache_hit_ratio", "Share of lookups served by a cache.",
+            [((("cache", name),), cache["hit_ratio"])
+             for name, cache in caches]
+        ),
+        metrics.gauge_lines(
+            "index_cache_entries", "Entries held by a cache.",
+            [((("cache", name),), cache["size"]) for name, cache in caches]
+        ),
+    ]
+
+
+def shards_ready(coordinator):
+    """Report whether every shard is ready."""
+    context = dict(model.status)
+    try:
+        responses = coordinator.get("ready")
+    except requests.RequestException as error:
+        context["ready"] = False
+        context["error"] = str(error)
+        return jsonify(**context), 503
+    context["shards"] = [response.json() for response in responses]
+    context["documents"] = sum(shard.get("documents", 0)
+                               for shard in context["shards"])
+    context["ready"] = all(response.status_code == 200
+                           for response in responses)
+    return jsonify(**context), 200 if context["ready"] else 503
+
+
+def coordinate(coordinator, hits_args):
+    """Return a page of hits merged from every shard."""
+    try:
+        hits = coordinator.hits(hits_args)
+    except requests.RequestException as error:
+        index.app.logger.error("Shard request failed: %s", error)
+        context = {
+            "message": "Service Unavailable",
+            "status_code": 503
+        }
+        return jsonify(**context), 503
+    g.hit_count = len(hits)
+    return jsonify(hits=hits)
+
+
+def coordinate_batch(coordinator, batch):
+    """Return the results of a batch merged from every shard."""
+    try:
+        results = coordinator.hits_batch(batch)
+    except requests.RequestException as error:
+        index.app.logger.error("Shard request failed: %s", error)
+        context = {
+            "message": "Service Unavailable",
+            "status_code": 503
+        }
+        return jsonify(**context), 503
+    return jsonify(results=results)
+
+
+def parse_hits_args(args):
+    """Return the HitsArgs of a hits request.
+
+    args is a MultiDict of the request parameters.  Raises ValueError if
+    they are missing or invalid.
+    """
+    query = args.get('q')
+    weight = args.get('w', type=float)
+    if not isinstance(query, str) or weight is None:
+        raise ValueError("missing q or w")
+    # Optional paging, by default every hit is returned.  A value that
+    # isn't an integer is an error rather than the default, int() raises.
+    limit = args.get('limit')
+    hits_args = HitsArgs(
+        query=query,
+        weight=weight,
+        mode=args.get('mode', default='and'),
+        offset=int(args.get('offset', default=0)),
+        limit=None if limit is None else int(limit),
+    )
+    if (hits_args.limit is not None and hits_args.limit < 0) or \
+            hits_args.offset < 0 or hits_args.mode not in QUERY_MODES:
+        raise ValueError("invalid paging or mode")
+    return hits_args
+
+
+def hits_context(ranked, offset=0):
+    """Return the response context of the ranked hits starting at offset."""
+    docids, scores = ranked
+    return {
+        "hits": [{"docid": doc_id, "score": score}
+                 for doc_id, score in zip(docids[offset:].tolist(),
+                                          scores[offset:].tolist())]
+    }
 
 
-def check_empty(key, dict_return):
-    """Check empty."""
-    if key not in dict_return:
-        empty_context = {
-            "hits": []
-        }
-        return empty_context
-    return 0
-
-
-def compute_score(query_vector, weight, query_dict, dot_product_qd, doc):
-    """Compute weighted score."""
-    # Compute normalization factor for query and document
-    norm_d = 0
-    norm_q = 0
-
-    for item in query_vector:
-        norm_q += float(item) * float(item)
-
-    norm_q = sqrt(norm_q)
-
-    for key in query_dict:
-        norm_d = float(inverted_index[key][doc][1])
-        break
-
-    norm_d = sqrt(norm_d)
-
-    # Compute TF-IDF
-    dot_product_norm_qd = norm_q * norm_d
-    tfidf = dot_product_qd / dot_product_norm_qd
-
-    # Compute weighted score
-    weighted_score = \
-        float(weight) * float(page_rank[doc]) + \
-        (1 - float(weight)) * float(tfidf)
-    return weighted_score
-
-
-def calculate_vector(query_dict, weight, document_match, idf):
-    """Calculate query vector and document vector for each document."""
-    context = {}
-    for doc in document_match:
-        # q: <term frequency in query> * <idf>
-        # d: <term frequency in document> * <idf>
-        query_vector = []
-        document_vector = []
-        counter = 0
-        for key in query_dict:
-            idf_instance = idf[counter]
-            counter += 1
-            q_freq = query_dict[key]
-            d_freq = inverted_index[key][doc][0]
-            query_vector.append(int(q_freq) * float(idf_instance))
-            document_vector.append(int(d_freq) * float(idf_instance))
-
-        # Compute dot product
-        # dot_product_qd =
-        # dot(query_vector, document_vector)
-
-        weighted_score = compute_score(
-            query_vector, weight, query_dict,
-            dot(query_vector, document_vector), doc
-        )
+def cached_rank(data, query_plan, hits_args, shared=None):
+    """Return the top ranked docids and scores for hits_args.
+
+    shared maps (mode, words) to the match_documents() result for the query
+    words of a batch, computed once for every query that needs them.
+    """
+    if not query_plan.query_dict:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    end = None if hits_args.limit is None else \
+        hits_args.offset + hits_args.limit
+    words = tuple(sorted(query_plan.query_dict.items()))
+
+    # Hits only depend on the data version, the mode, the normalized query
+    # words, the weight and how many of the top hits are needed
+    cache_key = (data["version"], hits_args.mode, words, hits_args.weight,
+                 end)
+    ranked = cache_get(model.result_cache, cache_key)
+    if ranked is not None:
+        g.cache_status = "result"
+        return ranked
+    if shared and (hits_args.mode, words) in shared:
+        ranked = rank_matches(shared[hits_args.mode, words],
+                              hits_args.weight, end)
+    else:
+        ranked = rank(data, query_plan, hits_args.weight, end,
+                      hits_args.mode)
+    if len(ranked[0]) <= index.app.config["RESULT_CACHE_MAX_HITS"]:
+        model.result_cache.put(cache_key, ranked)
+    return ranked
+
+
+def cache_get(cache, key):
+    """Return cache.get(key), or None when the request is being profiled."""
+    if g.get("profiling"):
+        return None
+    return cache.get(key)
+
+
+def share_matches(data, queries):
+    """Return match_documents() of the query words used more than once.
+
+    queries is a list of (QueryPlan, HitsArgs), or None for invalid ones.
+    The result maps (mode, words) to the matches.
+    """
+    plans = collections.defaultdict(list)
+    for query_plan, hits_args in filter(None, queries):
+        if query_plan.query_dict:
+            words = tuple(sorted(query_plan.query_dict.items()))
+            plans[hits_args.mode, words].append(query_plan)
+    return {
+        (mode, words): match_documents(data, same[0], mode)
+        for (mode, words), same in plans.items() if len(same) > 1
+    }
 
-        # Update context with weighted score and related doc_id
-        context[doc] = weighted_score
-    return context
+
+def rank(data, query_plan, weight, end=None, mode="and"):
+    """Return docids and scores of the top end matching docs.
+
+    With mode "or" and a limit, the top docs are found with block-max score
+    bounds so that most docs having some query word are never scored.  The
+    bounds only hold for weights between 0 and 1, other weights fall back to
+    scoring every match.
+    """
+    if mode == "or" and end is not None and 0 <= weight <= 1 and \
+            data["bounds"] is not None:
+        # Bounded scoring also selects the top docs
+        with metrics.timed("score"):
+            return blockmax.top_k(query_plan.query_dict, weight, end, data)
+    return rank_matches(match_documents(data, query_plan, mode), weight, end)
+
+
+def rank_matches(matched, weight, end=None):
+    """Return docids and scores of the top end docs of match_documents()."""
+    document_match, tfidf, ranks = matched
+    with metrics.timed("blend"):
+        scores = scoring.weighted_scores(weight, tfidf, ranks)
+    with metrics.timed("sort"):
+        order = scoring.top_k(scores, end)
+        return document_match[order], scores[order]
+
+
+def match_documents(data, query_plan, mode="and"):
+    """Return matching docs, their tf-idf and PageRank.
+
+    Only the final blend depends on the weight, so the arrays are cached by
+    mode and query words alone and moving the weight slider doesn't redo the
+    work.
+    """
+    cache_key = (data["version"], mode,
+                 tuple(sorted(query_plan.query_dict.items())))
+    matched = cache_get(model.tfidf_cache, cache_key)
+    if matched is not None:
+        g.cache_status = "tfidf"
+        return matched
+
+    if mode == "or":
+        matched = match_any(data, query_plan)
+    else:
+        matched = match_all(data, query_plan)
+    metrics.candidates.observe(len(matched[0]), mode)
+    if len(matched[0]) <= index.app.config["TFIDF_CACHE_MAX_HITS"]:
+        model.tfidf_cache.put(cache_key, matched)
+    return matched
+
+
+def match_any(data, query_plan):
+    """Return docs having any query word, their tf-idf and PageRank."""
+    doc_table = data["doc_table"]
+    with metrics.timed("score"):
+        document_match, tfidf = scoring.union_tfidf_scores(
+            query_plan.query_dict, query_plan.postings, doc_table.norms
+        )
+    return (
+        doc_table.docids[document_match],
+        tfidf,
+        doc_table.ranks[document_match],
+    )
+
+
+def match_all(data, query_plan):
+    """Return docs having all query words, their tf-idf and PageRank."""
+    matched = np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0)
+
+    # The plan lists the terms rarest first
+    postings = query_plan.postings
+    with metrics.timed("intersect"):
+        document_match, positions = intersect(list(postings.values()))
+    if len(document_match) != 0:
+        doc_table = data["doc_table"]
+        document_match = np.asarray(document_match, dtype=np.intp)
+        with metrics.timed("score"):
+            matched = (
+                doc_table.docids[document_match],
+                scoring.tfidf_scores(query_plan.query_dict, postings,
+                                     dict(zip(postings, positions)),
+                                     doc_table.norms[document_match]),
+                doc_table.ranks[document_match],
+            )
+    return matched
@@ -0,0 +1,304 @@
+"""Binary inverted index file format and in-memory inverted index.
+
+The text inverted index written by the MapReduce pipeline is converted once
+into a compact binary file.  The index server opens the binary file with mmap,
+so startup doesn't parse anything and the pages are shared by every worker
+process on the machine.  Without a binary file, the text index is read into
+the same typed columns in memory.
+
+Documents are numbered 0, 1, ... in docid order.  Postings refer to docs by
+that internal doc number, and everything the score needs about a doc is in
+dense per-doc columns indexed by it, rather than repeated in every posting.
+
+Layout, all numbers little endian:
+
+    header          magic, number of terms, postings and docs
+    term_offsets    uint64[terms + 1], byte offset of each term in the blob
+    post_offsets    uint64[terms + 1], first posting of each term
+    idfs            float64[terms]
+    doc_norms       float64[docs], square root of the normalization factor
+    doc_ids         uint32[docs], docid of each doc, sorted
+    docs            uint32[postings], doc number, sorted within each term
+    tfs             uint32[postings], occurrences of the term in the doc
+    terms           utf-8 encoded terms, sorted bytewise
+
+Usage:
+$ python3 index/index/binindex.py inverted_index.txt inverted_index.bin
+"""
+import array
+import bisect
+import collections
+import collections.abc
+import math
+import mmap
+import os
+import struct
+import sys
+
+# Postings of one term.  docs are the sorted doc numbers of the docs having
+# the term, tfs is parallel to it.
+PostingList = collections.namedtuple("PostingList", ["idf", "docs", "tfs"])
+
+MAGIC = b"IDX485\x00\x02"
+HEADER = struct.Struct("<8sQQQ")
+
+
+def read_text_index(text_filename):
+    """Read a text inverted index into posting and doc columns.
+
+    Return a list of (term, idf, first posting, last posting + 1), the docs
+    and tfs columns with postings sorted by doc, and the doc_norms and
+    doc_ids columns.
+    """
+    terms = []
+    docids = array.array("I")
+    tfs = array.array("I")
+    norms = {}
+    with open(text_filename, mode='r', encoding='utf-8') as infile:
+        for line in infile:
+            line_split = line.split()
+            if not line_split:
+                continue
+            postings = sorted(
+                (int(line_split[item]),
+                 int(line_split[item+1]),
+                 float(line_split[item+2]))
+                for item in range(2, len(line_split), 3)
+            )
+            terms.append((line_split[0].encode('utf-8'), float(line_split[1]),
+                          len(docids), len(docids) + len(postings)))
+            for doc_id, occurrence, norm in postings:
+                docids.append(doc_id)
+                tfs.append(occurrence)
+                # Every posting of a doc has the same normalization factor
+                norms[doc_id] = norm
+
+    docs, doc_columns = number_docs(docids, norms)
+    return terms, (docs, tfs), doc_columns
+
+
+def number_docs(docids, norms):
+    """Assign doc numbers in docid order.
+
+    Return the docids column as doc numbers, and the doc_norms and doc_ids
+    columns indexed by doc number.
+    """
+    doc_ids = array.array("I", sorted(norms))
+    doc_numbers = {doc_id: number for number, doc_id in enumerate(doc_ids)}
+    doc_norms = array.array("d", (math.sqrt(norms[doc_id])
+                                  for doc_id in doc_ids))
+    docs = array.array("I", (doc_numbers[doc_id] for doc_id in docids))
+    return docs, (doc_norms, doc_ids)
+
+
+def layout(terms, columns, doc_columns):
+    """Return the array sections of the binary format, in file order."""
+    term_offsets = array.array("Q", [0])
+    post_offsets = array.array("Q", [0])
+    idfs = array.array("d")
+    sorted_columns = (array.array("I"), array.array("I"))
+    for term, idf, start, end in sorted(terms):
+        term_offsets.append(term_offsets[-1] + len(term))
+        post_offsets.append(post_offsets[-1] + end - start)
+        idfs.append(idf)
+        for column, values in zip(sorted_columns, columns):
+            column.extend(values[start:end])
+    return (term_offsets, post_offsets, idfs) + tuple(doc_columns) + \
+        sorted_columns
+
+
+def convert(text_filename, binary_filename):
+    """Convert a text inverted index into the binary format.
+
+    The file is written next to binary_filename and renamed over it, so a
+    server that has the old file mmapped keeps reading the old contents.
+    """
+    terms, columns, doc_columns = read_text_index(text_filename)
+    temp_filename = f"{binary_filename}.tmp"
+    with open(temp_filename, mode='wb') as outfile:
+        outfile.write(HEADER.pack(MAGIC, len(terms), len(columns[0]),
+                                  len(doc_columns[0])))
+        for section in layout(terms, columns, doc_columns):
+            if sys.byteorder != "little":
+                section.byteswap()
+            section.tofile(outfile)
+        outfile.write(b"".join(term for term, _, _, _ in sorted(terms)))
+    os.replace(temp_filename, binary_filename)
+
+
+class InvertedIndex(collections.abc.Mapping):
+    """Read-only inverted index stored in the binary format sections.
+
+    Maps a term to a PostingList whose columns are zero-copy views of the
+    sections, so a lookup costs a binary search and no parsing.
+    """
+
+    def __init__(self, sections, terms):
+        """Wrap the array sections from layout() and the term blob."""
+        self._term_offsets = sections[0]
+        self._post_offsets = sections[1]
+        self._idfs = sections[2]
+        self._documents = {
+            "norms": sections[3],
+            "ids": sections[4],
+        }
+        self._postings = {
+            "docs": sections[5],
+            "tfs": sections[6],
+        }
+        self._terms = terms
+
+    def _term(self, pos):
+        """Return the encoded term at position pos."""
+        return bytes(
+            self._terms[self._term_offsets[pos]:self._term_offsets[pos + 1]]
+        )
+
+    def term_number(self, term):
+        """Return the position of term in sorted order, or -1 if missing."""
+        if not isinstance(term, str):
+            return -1
+        key = term.encode('utf-8')
+        low, high = 0, len(self)
+        while low < high:
+            mid = (low + high) // 2
+            if self._term(mid) < key:
+                low = mid + 1
+            else:
+                high = mid
+        if low < len(self) and self._term(low) == key:
+            return low
+        return -1
+
+    def __contains__(self, term):
+        """Return True if term is in the index."""
+        return self.term_number(term) >= 0
+
+    def __getitem__(self, term):
+        """Return the PostingList of term."""
+        pos = self.term_number(term)
+        if pos < 0:
+            raise KeyError(term)
+        start = self._post_offsets[pos]
+        end = self._post_offsets[pos + 1]
+        return PostingList(
+            idf=self._idfs[pos],
+            docs=self._postings["docs"][start:end],
+            tfs=self._postings["tfs"][start:end],
+        )
+
+    def columns(self):
+        """Return the posting offset, idf, doc and tf columns.
+
+        Term number i owns postings post_offsets[i] to post_offsets[i + 1].
+        """
+        return (self._post_offsets, self._idfs, self._postings["docs"],
+                self._postings["tfs"])
+
+    def documents(self):
+        """Return the docid and square root norm of each doc number."""
+        return self._documents["ids"], self._documents["norms"]
+
+    def sections(self):
+        """Return the array sections and the term blob, see layout()."""
+        return [self._term_offsets, self._post_offsets, self._idfs,
+                self._documents["norms"], self._documents["ids"],
+                self._postings["docs"], self._postings["tfs"]], self._terms
+
+    def posting_stats(self):
+        """Return the number of postings and the bytes that store them."""
+        postings = self._post_offsets[-1]
+        plain_bytes = postings * 2 * array.array("I").itemsize
+        return {
+            "postings": postings,
+            "bytes": plain_bytes,
+            "plain_bytes": plain_bytes,
+            "compression_ratio": 1.0,
+        }
+
+    def __iter__(self):
+        """Iterate over terms in sorted order."""
+        for pos in range(len(self)):
+            yield self._term(pos).decode('utf-8')
+
+    def __len__(self):
+        """Return the number of terms."""
+        return len(self._idfs)
+
+
+def open_binary_index(binary_filename):
+    """Return an InvertedIndex backed by an mmap of binary_filename."""
+    if sys.byteorder != "little":
+        raise ValueError("binary index requires a little endian host")
+    with open(binary_filename, mode='rb') as infile:
+        view = memoryview(
+            mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        )
+    magic, num_terms, num_postings, num_docs = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError(f"{binary_filename} is not a binary index of this "
+                         "version, run bin/index convert")
+
+    offset = HEADER.size
+    sections = []
+    for typecode, length in (("Q", num_terms + 1), ("Q", num_terms + 1),
+                             ("d", num_terms), ("d", num_docs),
+                             ("I", num_docs), ("I", num_postings),
+                             ("I", num_postings)):
+        end = offset + length * array.array(typecode).itemsize
+        sections.append(view[offset:end].cast(typecode))
+        offset = end
+    return InvertedIndex(sections, view[offset:])
+
+
+def from_columns(terms, columns, doc_columns):
+    """Return an in-memory InvertedIndex of read_text_index() output."""
+    sections = [memoryview(section)
+                for section in layout(terms, columns, doc_columns)]
+    return InvertedIndex(
+        sections, b"".join(term for term, _, _, _ in sorted(terms))
+    )
+
+
+def load_text_index(text_filename):
+    """Return an in-memory InvertedIndex read from a text inverted index."""
+    return from_columns(*read_text_index(text_filename))
+
+
+def select_docs(inverted_index, low, high):
+    """Return an in-memory InvertedIndex of the docids in [low, high).
+
+    idfs are kept as they are, so scores computed from the selection are the
+    same as from the whole index.  Docs are numbered from 0 again, and terms
+    without postings in the range are dropped.
+    """
+    doc_ids, doc_norms = inverted_index.documents()
+    first = bisect.bisect_left(doc_ids, low)
+    last = bisect.bisect_left(doc_ids, high, first)
+    terms = []
+    columns = (array.array("I"), array.array("I"))
+    for term in inverted_index:
+        posting = inverted_index[term]
+        start = bisect.bisect_left(posting.docs, first)
+        end = bisect.bisect_left(posting.docs, last, start)
+        if start == end:
+            continue
+        terms.append((term.encode('utf-8'), posting.idf,
+                      len(columns[0]), len(columns[0]) + end - start))
+        columns[0].extend(doc - first for doc in posting.docs[start:end])
+        columns[1].extend(posting.tfs[start:end])
+    return from_columns(terms, columns, (
+        array.array("d", doc_norms[first:last]),
+        array.array("I", doc_ids[first:last]),
+    ))
+
+
+def main():
+    """Convert the text index given on the command line."""
+    if len(sys.argv) != 3:
+        sys.exit(f"Usage: {sys.argv[0]} INVERTED_INDEX_TXT OUTPUT_BIN")
+    convert(sys.argv[1], sys.argv[2])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Disjunctive (OR) top-k retrieval with block-max score bounds.
+
+A document's score is w * pagerank + (1 - w) * sum over query words t in
+the document of a_t * c_td where a_t = q_t * idf_t / |q| depends on the
+query only and c_td = tf_td * idf_t / sqrt(norm_d) on the index only.
+Docs are identified by doc number, see index/binindex.py.
+
+Bounds on c_td and on PageRank are precomputed per term and per block of
+postings at load time.  At query time the doc numbers are cut at every block
+boundary of the query words, which bounds the score of every doc in each
+piece.  The pieces with the highest bounds are scored first to get a
+threshold, then only the blocks of pieces that can beat it are scored.
+Everything is done with array operations on whole blocks, so most postings
+of common words are never touched by Python code.
+"""
+import collections
+import numpy as np
+from index.binindex import PostingList
+from index import compress, scoring
+
+# Score bounds of an index, see compute_bounds().  The blocks of term number
+# i are block_offsets[i] to block_offsets[i + 1].
+Bounds = collections.namedtuple("Bounds", [
+    "block_size", "block_offsets", "block_last", "block_max",
+    "block_max_rank", "term_max", "max_rank",
+])
+
+# A query word's postings and the bounds of its blocks
+QueryTerm = collections.namedtuple("QueryTerm", [
+    "posting", "block_size", "block_last", "block_max", "block_max_rank",
+])
+
+
+def compute_bounds(inverted_index, doc_table, block_size):
+    """Return the Bounds of every term and every block of postings.
+
+    doc_table is the scoring.DocTable of inverted_index.
+    """
+    post_offsets, idfs, docs, tfs = (
+        np.asarray(column) for column in inverted_index.columns()
+    )
+    post_offsets = post_offsets.astype(np.int64)
+    block_offsets, block_starts, block_lengths = compress.block_layout(
+        post_offsets, block_size
+    )
+    block_ends = block_starts + block_lengths
+    if len(block_starts) == 0:
+        empty = np.zeros(0)
+        return Bounds(block_size, block_offsets, empty.astype(np.int64),
+                      empty, empty, np.zeros(len(idfs)), 0.0)
+
+    contributions = (tfs * np.repeat(idfs, np.diff(post_offsets)) /
+                     doc_table.norms[docs])
+    ranks = doc_table.ranks[docs]
+    block_max = np.maximum.reduceat(contributions, block_starts)
+    return Bounds(
+        block_size=block_size,
+        block_offsets=block_offsets,
+        block_last=docs[block_ends - 1].astype(np.int64),
+        block_max=block_max,
+        block_max_rank=np.maximum.reduceat(ranks, block_starts),
+        term_max=np.maximum.reduceat(block_max, block_offsets[:-1]),
+        max_rank=float(ranks.max()),
+    )
+
+
+def query_terms(query_dict, inverted_index, bounds):
+    """Return {word: QueryTerm} for the query words.
+
+    Query words that aren't in the index can't match anything and are left
+    out.
+    """
+    terms = {}
+    for key in query_dict:
+        number = inverted_index.term_number(key)
+        if number < 0:
+            continue
+        blocks = slice(bounds.block_offsets[number],
+                       bounds.block_offsets[number + 1])
+        terms[key] = QueryTerm(
+            posting=inverted_index[key],
+            block_size=bounds.block_size,
+            block_last=bounds.block_last[blocks],
+            block_max=bounds.block_max[blocks],
+            block_max_rank=bounds.block_max_rank[blocks],
+        )
+    return terms
+
+
+def piece_bounds(query_dict, weight, terms):
+    """Cut doc numbers at block boundaries and bound the score of each piece.
+
+    Piece j holds the docs in (ends[j - 1], ends[j]], which fall in the
+    same block of every query word.  Return (ends, upper, blocks) where
+    upper[j] bounds the score of every doc in piece j and blocks[key][j] is
+    the block of key covering piece j, or the number of blocks of key when
+    the piece is past its last posting.
+    """
+    ends = np.unique(np.concatenate([term.block_last
+                                     for term in terms.values()]))
+    norm_q = np.sqrt(sum((query_dict[key] * term.posting.idf) ** 2
+                         for key, term in terms.items()))
+    tfidf = np.zeros(len(ends))
+    rank = np.zeros(len(ends))
+    blocks = {}
+    for key, term in terms.items():
+        blocks[key] = np.searchsorted(term.block_last, ends)
+        covered = blocks[key] < len(term.block_last)
+        covering = blocks[key][covered]
+        if norm_q > 0:
+            tfidf[covered] += (query_dict[key] * term.posting.idf / norm_q *
+                               term.block_max[covering])
+        rank[covered] = np.maximum(rank[covered],
+                                   term.block_max_rank[covering])
+    return ends, scoring.weighted_scores(weight, tfidf, rank), blocks
+
+
+def block_postings(term, needed, ends, keep):
+    """Return a PostingList of the postings of term in the kept pieces.
+
+    needed are the blocks of term covering those pieces.
+    """
+    posting = term.posting
+    needed = needed[needed < len(term.block_last)]
+    positions = (needed[:, np.newaxis] * term.block_size +
+                 np.arange(term.block_size)).ravel()
+    positions = positions[positions < len(posting.docs)]
+
+    # Blocks stick out of the pieces they cover, drop docs outside
+    docs = scoring.column(posting.docs, positions)
+    inside = keep[np.searchsorted(ends, docs)]
+    return PostingList(
+        idf=posting.idf,
+        docs=docs[inside],
+        tfs=scoring.column(posting.tfs, positions[inside]),
+    )
+
+
+def score_pieces(query_dict, weight, terms, pieces, doc_table):
+    """Return the docs and scores of every doc in the selected pieces.
+
+    pieces is (ends, keep, blocks) where keep is a boolean mask of the
+    pieces to score.  Only the blocks covering those pieces are read.
+    """
+    ends, keep, blocks = pieces
+    postings = {
+        key: block_postings(term, np.unique(blocks[key][keep]), ends, keep)
+        for key, term in terms.items()
+    }
+    docs, tfidf = scoring.union_tfidf_scores(query_dict, postings,
+                                             doc_table.norms)
+    return docs, scoring.weighted_scores(weight, tfidf,
+                                         doc_table.ranks[docs])
+
+
+def best_first(k, upper, score):
+    """Score pieces from the highest bound down until the top k are known.
+
+    score(keep) returns the docs and scores of the docs in the pieces
+    selected by the boolean mask keep.  Pieces are scored in batches that
+    double in size, until the k-th best score so far beats every remaining
+    bound.  Return the docs and scores of every doc scored.
+    """
+    order = np.argsort(-upper, kind="stable")
+    # Bounds and scores are summed in different orders, allow for rounding
+    upper = upper + 1e-9 * np.abs(upper)
+    docs = [np.zeros(0, dtype=np.int64)]
+    scores = [np.zeros(0)]
+    threshold = -np.inf
+    scored = 0
+    batch = k
+    while scored < len(order) and upper[order[scored]] >= threshold:
+        keep = np.zeros(len(upper), dtype=bool)
+        keep[order[scored:scored + batch]] = True
+        matches, match_scores = score(keep)
+        docs.append(matches)
+        scores.append(match_scores)
+        scored += batch
+        batch *= 2
+        if sum(len(item) for item in scores) >= k:
+            threshold = -np.partition(-np.concatenate(scores), k - 1)[k - 1]
+    return np.concatenate(docs), np.concatenate(scores)
+
+
+def top_k(query_dict, weight, k, index_data):
+    """Return docids and scores of the k best docs with any query word.
+
+    index_data has the "inverted_index", "doc_table" and "bounds" of the
+    index.  Requires 0 <= weight <= 1 so that the bounds hold.  The result
+    is the same as ranking every doc with any query word, ties included.
+    """
+    terms = query_terms(query_dict, index_data["inverted_index"],
+                        index_data["bounds"])
+    if not terms or k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    ends, upper, blocks = piece_bounds(query_dict, weight, terms)
+
+    def score(keep):
+        return score_pieces(query_dict, weight, terms, (ends, keep, blocks),
+                            index_data["doc_table"])
+    docs, scores = best_first(k, upper, score)
+
+    # Pieces are scored out of doc order, restore it so ties rank by docid
+    by_doc = np.argsort(docs)
+    docs = docs[by_doc]
+    scores = scores[by_doc]
+    order = scoring.top_k(scores, k)
+    return index_data["doc_table"].docids[docs[order]], scores[order]
@@ -0,0 +1,60 @@
+"""In-process caches for the index server."""
+import collections
+import threading
+
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entry.
+
+    Safe to share between the threads of one server process.  Counts hits
+    and misses so that the cache can be sized from production traffic.
+    """
+
+    def __init__(self, maxsize):
+        """Create an empty cache holding at most maxsize entries."""
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the value cached for key, or None."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Cache value for key, evicting the least recently used entries."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry, e.g. after the data it was computed from changed.
+
+        The hit and miss counters keep counting.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return size and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,327 @@
+"""Compressed in-memory posting lists.
+
+With COMPRESSED_BLOCK_SIZE set, see config.py, the doc and tf columns of the
+inverted index are packed at load time instead of being kept as uint32
+arrays.  Each posting list is cut into blocks of block_size postings.  A
+block stores the doc number of its first posting, then the gap to the
+previous doc number minus one and the tf minus one of every posting, each
+bit packed at the width of the largest value in its block.  Common words
+have small gaps and most tfs are 1, so both take a few bits and a block of
+tfs that are all 1 takes none.
+
+Decoding is vectorized: every value is read from the 8 bytes starting at its
+first bit, whatever its block and width.  Queries only decode the blocks they
+need: intersecting a rare word with a common one decodes the blocks of the
+common list that may hold the rare word's docs, and scoring decodes the tfs
+of the blocks holding the matches.
+"""
+import collections
+import numpy as np
+from index.binindex import InvertedIndex, PostingList
+
+# Packed postings of an index, see pack().  The blocks of term number i are
+# block_offsets[i] to block_offsets[i + 1].  Block j starts at byte
+# offsets[j] of data with the gaps of its postings, followed by their tfs.
+Packed = collections.namedtuple("Packed", [
+    "block_size", "block_offsets", "first", "offsets", "gap_widths",
+    "tf_widths", "data",
+])
+
+# Powers of two, to compute bit widths with a binary search
+POWERS = 2 ** np.arange(33, dtype=np.int64)
+
+# Blocks packed at once, which bounds the temporary memory used by pack()
+PACK_CHUNK_BLOCKS = 8192
+
+
+def sorted_unique(values):
+    """Return the distinct values of a sorted array."""
+    if len(values) == 0:
+        return values
+    return values[np.concatenate([[True], values[1:] != values[:-1]])]
+
+
+def bit_width(values):
+    """Return the number of bits needed to store each value."""
+    return np.searchsorted(POWERS, values, side="right").astype(np.uint8)
+
+
+def write_bits(size, offsets, values):
+    """Return size bytes with values written at bit offsets.
+
+    The values must fit in 32 bits and not overlap.  Their bits are spread
+    over the 5 bytes starting at offsets // 8, so the bytes of all the
+    values are summed with bincount, which is the same as or-ing them.
+    """
+    shifted = values.astype(np.uint64) << (offsets & 7).astype(np.uint64)
+    first_bytes = offsets >> 3
+    data = np.zeros(size + 8)
+    for byte in range(5):
+        data += np.bincount(
+            first_bytes + byte,
+            weights=(shifted >> np.uint64(8 * byte)) & np.uint64(0xFF),
+            minlength=len(data),
+        )[:len(data)]
+    return data.astype(np.uint8)
+
+
+def read_bits(data, offsets, widths):
+    """Return the values of widths bits at bit offsets of data.
+
+    Each value is read with the unaligned 8 byte word starting at its first
+    byte, which holds all its bits.
+    """
+    words = np.ndarray(shape=(len(data) - 7,), dtype="<u8", buffer=data,
+                       strides=(1,))[offsets >> 3]
+    masks = (np.uint64(1) << widths.astype(np.uint64)) - np.uint64(1)
+    return (words >> (offsets & 7).astype(np.uint64)) & masks
+
+
+def pack_blocks(docs, tfs, starts, lengths):
+    """Pack consecutive blocks of postings.
+
+    starts and lengths locate each block in docs and tfs.  Return the bytes
+    of the blocks, the byte offset of each block in them, and the gap and tf
+    widths of each block.
+    """
+    gaps = np.zeros(len(docs), dtype=np.int64)
+    gaps[1:] = docs[1:] - docs[:-1] - 1
+    gaps[starts] = 0
+    tfs = tfs - 1
+    gap_widths = bit_width(np.maximum.reduceat(gaps, starts))
+    tf_widths = bit_width(np.maximum.reduceat(tfs, starts))
+
+    # Blocks start on a byte boundary
+    sizes = (lengths * (gap_widths.astype(np.int64) + tf_widths) + 7) // 8
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+
+    blocks = np.repeat(np.arange(len(starts)), lengths)
+    items = np.arange(len(docs)) - starts[blocks]
+    block_bits = 8 * offsets[blocks]
+    tf_bits = block_bits + lengths[blocks] * gap_widths[blocks]
+    data = write_bits(
+        int(offsets[-1]),
+        np.concatenate([block_bits + items * gap_widths[blocks],
+                        tf_bits + items * tf_widths[blocks]]),
+        np.concatenate([gaps, tfs]),
+    )
+    return data[:offsets[-1]], offsets[:-1], gap_widths, tf_widths
+
+
+def block_layout(post_offsets, block_size):
+    """Split every posting list into blocks of block_size postings.
+
+    Return (block_offsets, block_starts, block_lengths): the blocks of term
+    i are block_offsets[i] to block_offsets[i + 1] and block j holds
+    block_lengths[j] postings from posting block_starts[j].  Blocks never
+    span two terms.
+    """
+    post_offsets = np.asarray(post_offsets, dtype=np.int64)
+    lengths = np.diff(post_offsets)
+    blocks_per_term = (lengths + block_size - 1) // block_size
+    block_offsets = np.concatenate([[0], np.cumsum(blocks_per_term)])
+    block_terms = np.repeat(np.arange(len(lengths)), blocks_per_term)
+    block_starts = post_offsets[block_terms] + block_size * (
+        np.arange(block_offsets[-1]) - block_offsets[block_terms]
+    )
+    block_lengths = np.minimum(block_starts + block_size,
+                               post_offsets[block_terms + 1]) - block_starts
+    return block_offsets, block_starts, block_lengths
+
+
+def pack(post_offsets, docs, tfs, block_size):
+    """Return the Packed postings of the posting columns of an index.
+
+    Term number i owns postings post_offsets[i] to post_offsets[i + 1].
+    """
+    block_offsets, block_starts, block_lengths = block_layout(post_offsets,
+                                                              block_size)
+    docs = np.asarray(docs)
+    tfs = np.asarray(tfs)
+    chunks = []
+    for chunk in range(0, len(block_starts), PACK_CHUNK_BLOCKS):
+        starts = block_starts[chunk:chunk + PACK_CHUNK_BLOCKS]
+        lengths = block_lengths[chunk:chunk + PACK_CHUNK_BLOCKS]
+        postings = slice(starts[0], starts[-1] + lengths[-1])
+        chunks.append(pack_blocks(
+            docs[postings].astype(np.int64), tfs[postings].astype(np.int64),
+            starts - starts[0], lengths,
+        ))
+    bases = np.cumsum([0] + [len(data) for data, _, _, _ in chunks])
+    return Packed(
+        block_size=block_size,
+        block_offsets=block_offsets,
+        first=docs[block_starts].astype(np.uint32),
+        offsets=np.concatenate([np.zeros(0, dtype=np.int64)] + [
+            offsets + base for (_, offsets, _, _), base in zip(chunks, bases)
+        ]).astype(np.uint64),
+        gap_widths=np.concatenate([np.zeros(0, dtype=np.uint8)] +
+                                  [chunk[2] for chunk in chunks]),
+        tf_widths=np.concatenate([np.zeros(0, dtype=np.uint8)] +
+                                 [chunk[3] for chunk in chunks]),
+        # Padding, so that reading the last value never runs past the end
+        data=np.concatenate([chunk[0] for chunk in chunks] +
+                            [np.zeros(8, dtype=np.uint8)]),
+    )
+
+
+def unpack(packed, blocks, lengths, field):
+    """Return the values of field "docs" or "tfs" in the given blocks.
+
+    blocks are sorted block numbers and lengths their number of postings.
+    """
+    numbers = np.repeat(blocks, lengths)
+    starts = np.cumsum(lengths) - lengths
+    items = np.arange(len(numbers)) - np.repeat(starts, lengths)
+    bits = 8 * packed.offsets[numbers]
+    if field == "tfs":
+        bits += (np.repeat(lengths, lengths) *
+                 packed.gap_widths[numbers]).astype(np.uint64)
+        widths = packed.tf_widths[numbers]
+    else:
+        widths = packed.gap_widths[numbers]
+    values = read_bits(packed.data,
+                       bits + (items * widths).astype(np.uint64),
+                       widths).astype(np.int64) + 1
+    if field == "tfs":
+        return values
+
+    # Doc numbers are the first doc of the block plus the running sum of the
+    # gaps, the first gap of each block is 0
+    sums = np.cumsum(values)
+    if len(sums) != 0:
+        sums -= np.repeat(sums[starts] - 1, lengths)
+    return np.repeat(packed.first[blocks].astype(np.int64) - 1,
+                     lengths) + sums
+
+
+class PackedColumn:
+    """The docs or the tfs of one packed posting list.
+
+    len(), iteration and conversion to a numpy array decode the whole list.
+    take(), keep_present() and locate() only decode the blocks they need.
+    """
+
+    def __init__(self, packed, number, length, field):
+        """Use field "docs" or "tfs" of term number, which has length."""
+        self.packed = packed
+        self.blocks = slice(packed.block_offsets[number],
+                            packed.block_offsets[number + 1])
+        self.length = length
+        self.field = field
+
+    def decode(self, blocks):
+        """Return the positions and values of the given blocks of the list.
+
+        blocks are sorted block numbers counted from the first block of the
+        list.
+        """
+        block_size = self.packed.block_size
+        lengths = np.minimum(block_size, self.length - blocks * block_size)
+        items = np.arange(lengths.sum()) - np.repeat(
+            np.cumsum(lengths) - lengths, lengths
+        )
+        return (np.repeat(blocks * block_size, lengths) + items,
+                unpack(self.packed, blocks + self.blocks.start, lengths,
+                       self.field))
+
+    def __len__(self):
+        """Return the number of postings."""
+        return self.length
+
+    def __array__(self, dtype=None, copy=None):
+        """Decode the whole list."""
+        del copy
+        values = self.decode(np.arange(self.blocks.stop - self.blocks.start))
+        return values[1] if dtype is None else values[1].astype(dtype)
+
+    def __iter__(self):
+        """Iterate over the decoded values."""
+        return iter(np.asarray(self).tolist())
+
+    def take(self, positions):
+        """Return the values at sorted positions of the list."""
+        positions = np.asarray(positions, dtype=np.int64)
+        blocks, items = np.divmod(positions, self.packed.block_size)
+        needed = sorted_unique(blocks)
+        decoded, values = self.decode(needed)
+        starts = np.searchsorted(decoded, needed * self.packed.block_size)
+        return values[starts[np.searchsorted(needed, blocks)] + items]
+
+    def find(self, targets):
+        """Return which sorted doc numbers targets are in the list, and where.
+
+        Only the blocks that may hold a target are decoded.  The result is
+        a boolean mask over targets and the position of each target found.
+        """
+        targets = np.asarray(targets, dtype=np.int64)
+        blocks = np.searchsorted(self.packed.first[self.blocks], targets,
+                                 side="right") - 1
+        positions, docs = self.decode(sorted_unique(blocks[blocks >= 0]))
+        if len(docs) == 0:
+            return np.zeros(len(targets), dtype=bool), positions
+        found = np.searchsorted(docs, targets).clip(max=len(docs) - 1)
+        present = docs[found] == targets
+        return present, positions[found[present]]
+
+    def keep_present(self, candidates):
+        """Return the sorted candidates that are in the list."""
+        present, _ = self.find(candidates)
+        return np.asarray(candidates)[present].tolist()
+
+    def locate(self, targets):
+        """Return the positions of sorted targets, which are all present."""
+        return self.find(targets)[1]
+
+
+class PackedIndex(InvertedIndex):
+    """InvertedIndex whose posting lists are packed in memory.
+
+    Posting lists have PackedColumn docs and tfs.  Terms, idfs and the doc
+    columns are shared with the index it is packed from.
+    """
+
+    def __init__(self, inverted_index, block_size):
+        """Pack the postings of inverted_index in blocks of block_size."""
+        sections, terms = inverted_index.sections()
+        super().__init__(sections, terms)
+        self._postings = {
+            "packed": pack(sections[1], sections[5], sections[6], block_size),
+        }
+
+    def __getitem__(self, term):
+        """Return the PostingList of term."""
+        pos = self.term_number(term)
+        if pos < 0:
+            raise KeyError(term)
+        length = self._post_offsets[pos + 1] - self._post_offsets[pos]
+        return PostingList(
+            idf=self._idfs[pos],
+            docs=PackedColumn(self._postings["packed"], pos, length, "docs"),
+            tfs=PackedColumn(self._postings["packed"], pos, length, "tfs"),
+        )
+
+    def columns(self):
+        """Return the posting offset, idf, doc and tf columns, decoded."""
+        packed = self._postings["packed"]
+        _, _, block_lengths = block_layout(self._post_offsets,
+                                           packed.block_size)
+        blocks = np.arange(len(block_lengths))
+        return (self._post_offsets, self._idfs,
+                unpack(packed, blocks, block_lengths, "docs"),
+                unpack(packed, blocks, block_lengths, "tfs"))
+
+    def sections(self):
+        """Return the array sections and the term blob, postings decoded."""
+        _, _, docs, tfs = self.columns()
+        return [self._term_offsets, self._post_offsets, self._idfs,
+                self._documents["norms"], self._documents["ids"],
+                docs, tfs], self._terms
+
+    def posting_stats(self):
+        """Return the number of postings and the bytes that store them."""
+        stats = super().posting_stats()
+        stats["bytes"] = sum(column.nbytes
+                             for column in self._postings["packed"][1:])
+        stats["compression_ratio"] = stats["plain_bytes"] / stats["bytes"]
+        return stats
@@ -0,0 +1,88 @@
+"""Index server development configuration."""
+
+import os
+import pathlib
+
+# Root of the index package, data files live next to the code
+INDEX_ROOT = pathlib.Path(__file__).resolve().parent
+
+# Output of the MapReduce pipeline, see hadoop/inverted_index/pipeline.sh
+INVERTED_INDEX_FILENAME = INDEX_ROOT/'inverted_index.txt'
+
+# Binary copy of the inverted index, created with "bin/index convert".  It is
+# used instead of the text file when it exists and is at least as new.
+BINARY_INDEX_FILENAME = INDEX_ROOT/'inverted_index.bin'
+
+PAGERANK_FILENAME = INDEX_ROOT/'pagerank.out'
+STOPWORDS_FILENAME = INDEX_ROOT/'stopwords.txt'
+
+# Queries replayed at startup, before /api/v1/ready reports ready, and after
+# every reload
+WARMUP_QUERIES = []
+
+# Seconds between checks for new data files, 0 disables watching.  New files
+# are loaded in the background and swapped in without dropping requests.
+# Replace files with mv rather than writing them in place.
+INDEX_RELOAD_INTERVAL = 5
+
+# Token required in the X-Admin-Token header of admin requests such as
+# POST /api/v1/reload.  When None, admin requests are only accepted from
+# localhost.
+INDEX_ADMIN_TOKEN = None
+
+# Profiling, see index/profiling.py.  An admin's profile=1 hits request
+# returns the PROFILE_TOP_FUNCTIONS functions with the most cumulative time.
+# With PROFILE_SAMPLE_RATE = N, one in N hits requests is profiled and the
+# latest PROFILE_KEEP reports are served by /api/v1/profiles.  0 disables
+# sampling.
+PROFILE_SAMPLE_RATE = 0
+PROFILE_TOP_FUNCTIONS = 20
+PROFILE_KEEP = 50
+
+# Structured query log, see index/querylog.py.  One in
+# QUERY_LOG_SAMPLE_RATE hits requests is written to QUERY_LOG_FILENAME as a
+# line of JSON.  None disables the log.
+QUERY_LOG_FILENAME = None
+QUERY_LOG_SAMPLE_RATE = 1
+
+# Query result cache, see index/cache.py.  At most RESULT_CACHE_SIZE queries
+# are cached, and queries with more than RESULT_CACHE_MAX_HITS hits are not.
+RESULT_CACHE_SIZE = 1024
+RESULT_CACHE_MAX_HITS = 10000
+
+# Most queries accepted by one POST /api/v1/hits/batch request
+HITS_BATCH_MAX = 1000
+
+# Weight independent tf-idf cache, reused when only the weight changes
+TFIDF_CACHE_SIZE = 256
+TFIDF_CACHE_MAX_HITS = 50000
+
+# Postings per block of the score bounds used by mode=or queries, see
+# index/blockmax.py.  Smaller blocks give tighter bounds but take more memory.
+# 0 disables the bounds and mode=or queries score every match.
+OR_BLOCK_SIZE = 64
+
+# Keep the posting lists compressed in memory, see index/compress.py.  Doc
+# numbers and tfs are packed in blocks of COMPRESSED_BLOCK_SIZE postings,
+# which takes a fraction of the memory but makes queries decode them.  0
+# keeps them as plain arrays.
+COMPRESSED_BLOCK_SIZE = 0
+
+# Worker processes of the pre-forked server, see index/prefork.py, each
+# with INDEX_WORKER_THREADS threads.  The data is loaded once and shared by
+# the forked workers.  Set from the environment by
+# "INDEX_WORKERS=N bin/index start", 1 runs the development server.
+INDEX_WORKERS = int(os.environ.get("INDEX_WORKERS", "1"))
+INDEX_WORKER_THREADS = 4
+
+# Document range sharding, see index/shards.py.  A shard server keeps the
+# docs of shard INDEX_SHARD_NUMBER out of INDEX_SHARD_COUNT.  A server with
+# INDEX_SHARD_URLS, the /api/v1/ URLs of the shards, is a coordinator that
+# holds no data and fans queries out to them.  Set from the environment by
+# "INDEX_SHARDS=N bin/index start".
+INDEX_SHARD_NUMBER = int(os.environ.get("INDEX_SHARD_NUMBER", "0"))
+INDEX_SHARD_COUNT = int(os.environ.get("INDEX_SHARD_COUNT", "1"))
+INDEX_SHARD_URLS = [
+    url for url in os.environ.get("INDEX_SHARD_URLS", "").split(",") if url
+]
+INDEX_SHARD_TIMEOUT = 10
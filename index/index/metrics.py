@@ -0,0 +1,158 @@
+"""In-process metrics of the index server, in the Prometheus text format.
+
+Recording a value costs a lock and a few additions, the text is only built
+when /api/v1/metrics is scraped.  Each process keeps its own metrics, so with
+pre-forked workers a scrape reports the worker that served it.
+"""
+import bisect
+import contextlib
+import threading
+import time
+
+# Upper bounds of the latency buckets, in seconds
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Upper bounds of the candidate set size buckets, in docs
+SIZE_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+
+
+def escape(value):
+    """Return value as the text of a label value."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"') \
+        .replace("\n", "\\n")
+
+
+def format_labels(labels):
+    """Return the {name="value",...} of a sample, empty without labels."""
+    pairs = ",".join(f'{name}="{escape(value)}"' for name, value in labels)
+    return "{" + pairs + "}" if pairs else ""
+
+
+def header(name, help_text, kind):
+    """Return the HELP and TYPE lines of a metric."""
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+
+
+class Counter:
+    """Counter with one series per combination of label values."""
+
+    def __init__(self, name, help_text, label_names):
+        """Create a counter with no series."""
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values):
+        """Add one to the series of label_values."""
+        with self._lock:
+            self._counts[label_values] = self._counts.get(label_values, 0) + 1
+
+    def lines(self):
+        """Return the text lines of the counter."""
+        with self._lock:
+            counts = sorted(self._counts.items())
+        return header(self.name, self.help_text, "counter") + [
+            f"{self.name}{format_labels(zip(self.label_names, values))} "
+            f"{count}"
+            for values, count in counts
+        ]
+
+
+class Histogram:
+    """Histogram with one series per value of a label."""
+
+    def __init__(self, name, help_text, label_name, buckets):
+        """Create a histogram with buckets, the sorted upper bounds."""
+        self.name = name
+        self.help_text = help_text
+        self.label_name = label_name
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, label_value):
+        """Count value in the series of label_value."""
+        # Counts per bucket, the +Inf bucket, then the sum of the values
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = [0] * (len(self.buckets) + 1) + [0.0]
+                self._series[label_value] = series
+            series[position] += 1
+            series[-1] += value
+
+    def lines(self):
+        """Return the text lines of the histogram, with cumulative buckets."""
+        with self._lock:
+            series = sorted((label_value, list(counts))
+                            for label_value, counts in self._series.items())
+        lines = header(self.name, self.help_text, "histogram")
+        for label_value, counts in series:
+            label = (self.label_name, label_value)
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                total += count
+                lines.append(f"{self.name}_bucket"
+                             f"{format_labels([label, ('le', bound)])} "
+                             f"{total}")
+            lines.append(f"{self.name}_sum{format_labels([label])} "
+                         f"{counts[-1]!r}")
+            lines.append(f"{self.name}_count{format_labels([label])} {total}")
+        return lines
+
+
+def gauge_lines(name, help_text, samples):
+    """Return the text lines of a gauge from (labels, value) samples."""
+    return header(name, help_text, "gauge") + [
+        f"{name}{format_labels(labels)} {float(value)!r}"
+        for labels, value in samples
+    ]
+
+
+# Requests served, by route and status code
+requests_total = Counter("index_requests_total", "HTTP requests served.",
+                         ("route", "status"))
+
+# Time of each stage of a hits query: parse, intersect, score (tf-idf),
+# blend (with PageRank), sort and serialize.  A stage is observed once per
+# request that runs it, cached stages aren't.
+stage_seconds = Histogram("index_stage_seconds",
+                          "Time spent in each stage of a hits query.",
+                          "stage", LATENCY_BUCKETS)
+
+# Docs matched by a query before ranking, by mode
+candidates = Histogram("index_candidates",
+                       "Documents matched by a query before ranking.",
+                       "mode", SIZE_BUCKETS)
+
+
+@contextlib.contextmanager
+def timed(stage):
+    """Record the time spent in the with block as stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage)
+
+
+def sampled(rate, counter):
+    """Return True for one in rate values of counter, an itertools.count.
+
+    next() on a count is atomic, so request threads can share counter.  A
+    rate of 0 samples nothing.
+    """
+    return rate > 0 and next(counter) % rate == 0
+
+
+def render(gauges):
+    """Return the text of every metric, gauges are gauge_lines() lists."""
+    lines = requests_total.lines() + stage_seconds.lines() + \
+        candidates.lines()
+    for gauge in gauges:
+        lines.extend(gauge)
+    return "\n".join(lines) + "\n"
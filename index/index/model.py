@@ -0,0 +1,307 @@
+"""Index server data model."""
+import array
+import pathlib
+import threading
+import time
+import numpy as np
+import index
+from index import (binindex, blockmax, compress, querylog, scoring,
+                   shards)
+from index.cache import LRUCache
+
+# Data served by the index server, one version of the data files
+#
+# doc table structure
+# DocTable(docids, norms, ranks)
+#
+# An index.scoring.DocTable, arrays indexed by doc number with the docid,
+# square root of the normalization factor and PageRank of each doc.
+#
+# inverted index structure
+# {"item1": PostingList(idf, docs, tfs),
+#  "item2": PostingList(idf, docs, tfs), ...}
+#
+# An index.binindex.InvertedIndex, either mmapped from inverted_index.bin or
+# read into memory from inverted_index.txt.  The posting columns are typed
+# arrays sorted by doc number, see index/binindex.py, or packed blocks with
+# COMPRESSED_BLOCK_SIZE, see index/compress.py.
+#
+# stop words structure
+# [list of words]
+#
+# bounds structure
+# index.blockmax.Bounds on the scores of each term and block of postings,
+# used by mode=or queries.  None when disabled with OR_BLOCK_SIZE = 0.
+#
+# coordinator structure
+# index.shards.Coordinator when this server fans queries out to shard servers
+# instead of holding the data itself, else None.
+#
+# version structure
+# Number of the version, increased by every load, part of the cache keys.
+#
+# The dict is never modified once served.  load() and reload() build a new
+# one and swap it in with a single assignment, so a request that took the
+# current() data once finishes on that version whatever happens meanwhile.
+served = {
+    "data": {
+        "doc_table": scoring.DocTable(np.zeros(0, dtype=np.int64),
+                                      np.zeros(0), np.zeros(0)),
+        "inverted_index": binindex.from_columns(
+            [], (array.array("I"), array.array("I")),
+            (array.array("d"), array.array("I")),
+        ),
+        "stop_words": frozenset(),
+        "bounds": None,
+        "coordinator": None,
+        "version": 0,
+    },
+}
+
+# Hits of recent queries, and the weight independent tf-idf and PageRank of
+# the docs matching recent query words, see index/api/views.py.  Keys include
+# the data version, and the caches are cleared whenever new data is swapped
+# in.
+result_cache = LRUCache(index.app.config["RESULT_CACHE_SIZE"])
+tfidf_cache = LRUCache(index.app.config["TFIDF_CACHE_SIZE"])
+
+# Startup progress, reported by /api/v1/ready.  The server is ready once the
+# data is loaded and the warmup queries have run.  Reloads happen in the
+# background while the previous version keeps serving.
+status = {
+    "loaded": False,
+    "ready": False,
+    "error": None,
+    "warmup_queries": 0,
+    "version": 0,
+    "reloading": False,
+}
+
+# Held while new data is being read, so that reloads don't pile up
+reload_lock = threading.Lock()
+
+# Set by index/prefork.py in its workers to the function asking the master
+# process to reload, see request_reload()
+prefork = {"request_reload": None}
+
+# data_signature() of the files last read by reload(), whether or not they
+# could be loaded, so that the watcher doesn't read them again
+read_files = {"signature": None}
+
+
+def current():
+    """Return the data currently served."""
+    return served["data"]
+
+
+def data_reloading():
+    """Return True while new data is being read."""
+    return reload_lock.locked()
+
+
+def load_page_rank(pagerank_filename):
+    """Read pagerank.out into a dict."""
+    page_rank = {}
+    with open(pagerank_filename, mode='r', encoding='utf-8') as page:
+        line = page.readline()
+        while line:
+            line = line.rstrip()
+            line_split = line.split(',')
+            page_rank[int(line_split[0])] = float(line_split[1])
+            line = page.readline()
+    return page_rank
+
+
+def load_stop_words(stopwords_filename):
+    """Read stopwords.txt into a set."""
+    stop_words = set()
+    with open(stopwords_filename, mode='r', encoding='utf-8') as stopwords:
+        line = stopwords.readline()
+        while line:
+            line = line.rstrip()
+            stop_words.add(line)
+            line = stopwords.readline()
+    return frozenset(stop_words)
+
+
+def load_inverted_index(text_filename, binary_filename):
+    """Open the binary index if it is up to date, else read the text one."""
+    text_filename = pathlib.Path(text_filename)
+    binary_filename = pathlib.Path(binary_filename)
+    if binary_filename.exists() and (
+            not text_filename.exists() or
+            binary_filename.stat().st_mtime >= text_filename.stat().st_mtime):
+        return binindex.open_binary_index(binary_filename)
+    return binindex.load_text_index(text_filename)
+
+
+def select_shard(inverted_index, number, count):
+    """Return the inverted index of the docs of one shard."""
+    low, high = shards.doc_range(inverted_index.documents()[0], number, count)
+    return binindex.select_docs(inverted_index, low, high)
+
+
+def warmup(queries):
+    """Replay queries so that index pages and caches are hot."""
+    with index.app.test_client() as client:
+        for query in queries:
+            response = client.get("/api/v1/hits/",
+                                  query_string={"q": query, "w": 0.5})
+            if response.status_code != 200:
+                index.app.logger.warning("Warmup query %r failed: %s",
+                                         query, response.status)
+            status["warmup_queries"] += 1
+
+
+def data_files(config):
+    """Return the paths of the data files, see config.py."""
+    return [pathlib.Path(config[key]) for key in (
+        "PAGERANK_FILENAME", "INVERTED_INDEX_FILENAME",
+        "BINARY_INDEX_FILENAME", "STOPWORDS_FILENAME",
+    )]
+
+
+def data_signature(config):
+    """Return the size and mtime of each data file, None when missing."""
+    signature = []
+    for path in data_files(config):
+        try:
+            stat = path.stat()
+        except OSError:
+            signature.append(None)
+        else:
+            signature.append((stat.st_size, stat.st_mtime_ns))
+    return signature
+
+
+def read_data(config, version):
+    """Read the data files and return a new data dict."""
+    page_rank = load_page_rank(config["PAGERANK_FILENAME"])
+    inverted_index = load_inverted_index(
+        config["INVERTED_INDEX_FILENAME"],
+        config["BINARY_INDEX_FILENAME"],
+    )
+    if config["INDEX_SHARD_COUNT"] > 1:
+        inverted_index = select_shard(inverted_index,
+                                      config["INDEX_SHARD_NUMBER"],
+                                      config["INDEX_SHARD_COUNT"])
+    doc_table = scoring.doc_table(inverted_index, page_rank)
+    bounds = None
+    if config["OR_BLOCK_SIZE"] > 0:
+        bounds = blockmax.compute_bounds(inverted_index, doc_table,
+                                         config["OR_BLOCK_SIZE"])
+    if config["COMPRESSED_BLOCK_SIZE"] > 0:
+        inverted_index = compress.PackedIndex(
+            inverted_index, config["COMPRESSED_BLOCK_SIZE"]
+        )
+    return {
+        "doc_table": doc_table,
+        "inverted_index": inverted_index,
+        "stop_words": load_stop_words(config["STOPWORDS_FILENAME"]),
+        "bounds": bounds,
+        "coordinator": None,
+        "version": version,
+    }
+
+
+def reload(changed_only=False):
+    """Read the data files again, swap the new data in and warm it up.
+
+    Requests keep being served from the previous data meanwhile, and keep
+    it if the new files can't be read.  Errors are reported by
+    /api/v1/ready.  Concurrent reloads run one after the other.  With
+    changed_only, does nothing if the files are the ones last read.  Return
+    True if new data was swapped in.
+    """
+    with reload_lock:
+        signature = data_signature(index.app.config)
+        if changed_only and signature == read_files["signature"]:
+            return False
+        read_files["signature"] = signature
+        status["reloading"] = True
+        start = time.perf_counter()
+        try:
+            new_data = read_data(index.app.config, current()["version"] + 1)
+        except (OSError, ValueError) as error:
+            status["error"] = str(error)
+            index.app.logger.error("Failed to load index data: %s", error)
+            return False
+        finally:
+            status["reloading"] = False
+        served["data"] = new_data
+
+    result_cache.clear()
+    tfidf_cache.clear()
+    status["loaded"] = True
+    status["error"] = None
+    status["version"] = new_data["version"]
+    index.app.logger.info("Loaded index data version %d in %.2fs",
+                          new_data["version"], time.perf_counter() - start)
+    warmup(index.app.config["WARMUP_QUERIES"])
+    status["ready"] = True
+    return True
+
+
+def request_reload():
+    """Reload in the background, return False if a reload is running.
+
+    Pre-forked workers leave the reload to the master process instead.
+    """
+    ask_master = prefork["request_reload"]
+    if ask_master is not None:
+        return ask_master()
+    if data_reloading():
+        return False
+    threading.Thread(target=reload, name="index-reload", daemon=True).start()
+    return True
+
+
+def watch(interval, reloaded=None):
+    """Reload whenever the data files change, checking every interval s.
+
+    A change is only picked up once the files have stayed the same for one
+    interval, so that a file still being copied into place isn't read.
+    Files already read by a POST /api/v1/reload aren't read again.  After
+    new data is swapped in, reloaded() is called if given.
+    """
+    config = index.app.config
+    previous = data_signature(config)
+    while True:
+        time.sleep(interval)
+        signature = data_signature(config)
+        if signature == previous and signature != read_files["signature"]:
+            if reload(changed_only=True) and reloaded is not None:
+                reloaded()
+        previous = signature
+
+
+def start_watching(reloaded=None):
+    """Start the thread reloading the data when the files change."""
+    interval = index.app.config["INDEX_RELOAD_INTERVAL"]
+    if interval > 0:
+        threading.Thread(target=watch, args=(interval, reloaded),
+                         name="index-watch", daemon=True).start()
+
+
+def load():
+    """Load data files, run the warmup queries and start watching for changes.
+
+    Errors are reported by /api/v1/ready rather than raised, so that the
+    server still starts and tells the deploy what went wrong.
+    """
+    config = index.app.config
+
+    # index/prefork.py starts these threads when serving pre-forked workers
+    if config["INDEX_WORKERS"] <= 1:
+        querylog.start()
+    if config["INDEX_SHARD_URLS"]:
+        served["data"] = dict(current(), coordinator=shards.Coordinator(
+            config["INDEX_SHARD_URLS"], config["INDEX_SHARD_TIMEOUT"]
+        ))
+        status["loaded"] = True
+        status["ready"] = True
+        return
+
+    if config["INDEX_WORKERS"] <= 1:
+        start_watching()
+    reload()
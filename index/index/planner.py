@@ -0,0 +1,86 @@
+"""Query planning: which posting lists a query reads, and in what order.
+
+The query is cleaned like the documents were, stop words are dropped and
+repeated words become one term with a count.  Each term is looked up in the
+inverted index once, which gives its posting list and document frequency.
+In "and" mode a term missing from the index means no doc can match, so
+planning stops there and nothing is read.  In "or" mode missing terms are
+dropped.  Terms are evaluated from the rarest up, so that an intersection
+starts from the smallest candidate set.
+"""
+import collections
+import re
+
+# Plan of a query.  query_dict maps each term to evaluate to its count in the
+# query, rarest term first, and postings maps it to its PostingList.
+# stopped lists the stop words dropped from the query and missing the terms
+# that aren't in the index.
+QueryPlan = collections.namedtuple(
+    "QueryPlan", ["query_dict", "postings", "stopped", "missing"]
+)
+
+
+def normalize(query):
+    """Return the words of query, cleaned like the document text."""
+    return re.sub(r'[^a-zA-Z0-9 ]+', '', query).lower().split()
+
+
+def plan(query, mode, data, lookups=None):
+    """Return the QueryPlan of query in mode for the served data.
+
+    lookups, when given, maps terms already looked up to their PostingList,
+    or None if missing.  It is filled in, so that the queries of a batch
+    look each term up once.
+    """
+    if lookups is None:
+        lookups = {}
+    counts = collections.Counter()
+    stopped = {}
+    for word in normalize(query):
+        if word in data["stop_words"]:
+            stopped[word] = True
+        else:
+            counts[word] += 1
+
+    # One lookup per distinct term
+    postings = {}
+    missing = []
+    for term in counts:
+        if term not in lookups:
+            try:
+                lookups[term] = data["inverted_index"][term]
+            except KeyError:
+                lookups[term] = None
+        if lookups[term] is not None:
+            postings[term] = lookups[term]
+        else:
+            missing.append(term)
+            if mode == "and":
+                postings = {}
+                break
+
+    order = sorted(postings, key=lambda term: len(postings[term].docs))
+    return QueryPlan(
+        query_dict={term: counts[term] for term in order},
+        postings={term: postings[term] for term in order},
+        stopped=list(stopped),
+        missing=missing,
+    )
+
+
+def explain(query_plan):
+    """Return a JSON description of query_plan."""
+    return {
+        "terms": [
+            {
+                "term": term,
+                "count": count,
+                "df": len(query_plan.postings[term].docs),
+                "idf": float(query_plan.postings[term].idf),
+            }
+            for term, count in query_plan.query_dict.items()
+        ],
+        "stop_words": query_plan.stopped,
+        "missing": query_plan.missing,
+        "short_circuit": not query_plan.query_dict,
+    }
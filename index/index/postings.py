@@ -0,0 +1,69 @@
+"""Posting list operations."""
+from bisect import bisect_left
+from index.compress import PackedColumn
+
+
+def gallop(docids, target, low=0):
+    """Return the first position at or after low with a docid >= target.
+
+    Probe low, low + 1, low + 3, low + 7, ... until a docid >= target shows
+    up, then binary search the last gap.  The cost is logarithmic in the
+    distance skipped rather than in the length of the list, which is what
+    makes intersecting a rare term with a common one cheap.
+    """
+    size = len(docids)
+    high = low
+    step = 1
+    while high < size and docids[high] < target:
+        low = high + 1
+        high += step
+        step *= 2
+    return bisect_left(docids, target, low, min(high, size))
+
+
+def keep_present(docids, candidates):
+    """Return the sorted candidates that are also in sorted docids."""
+    if isinstance(docids, PackedColumn):
+        return docids.keep_present(candidates)
+    kept = []
+    position = 0
+    for doc_id in candidates:
+        position = gallop(docids, doc_id, position)
+        if position == len(docids):
+            break
+        if docids[position] == doc_id:
+            kept.append(doc_id)
+    return kept
+
+
+def locate(docids, targets):
+    """Return the positions of sorted targets, which are all in docids."""
+    if isinstance(docids, PackedColumn):
+        return docids.locate(targets)
+    positions = []
+    position = 0
+    for doc_id in targets:
+        position = gallop(docids, doc_id, position)
+        positions.append(position)
+    return positions
+
+
+def intersect(posting_lists):
+    """Return the docs present in every posting list and their positions.
+
+    The result is (docs, positions) where docs is sorted and
+    positions[i][j] is the position of docs[j] in posting_lists[i].  Lists
+    are processed from the rarest up, so the candidate set starts as small as
+    possible and common lists are galloped through rather than copied.
+    """
+    rarest_first = sorted(posting_lists, key=lambda item: len(item.docs))
+    matches = list(rarest_first[0].docs)
+    for posting in rarest_first[1:]:
+        if not matches:
+            break
+        matches = keep_present(posting.docs, matches)
+    return matches, [
+        range(len(matches)) if len(matches) == len(posting.docs)
+        else locate(posting.docs, matches)
+        for posting in posting_lists
+    ]
@@ -0,0 +1,111 @@
+"""Serve the index with pre-forked gunicorn worker processes.
+
+$ INDEX_WORKERS=4 python3 -m index.prefork --port 8001
+
+Importing the app loads the data files in the master process, which then
+forks INDEX_WORKERS workers that share the loaded data copy-on-write.
+Python objects are frozen before the fork so that the garbage collector
+doesn't write to their pages, and the numpy columns and mmapped binary index
+are never written to, so one copy of the data serves every worker.
+
+Reloads happen in the master too, so that the workers keep sharing one
+copy.  The master watches the data files, and POST /api/v1/reload sends it
+SIGHUP.  Either way it reads the files that changed, then gunicorn forks new
+workers from the new data and shuts the old ones down once they finish
+their requests.  A POST while the master is reloading gets a 409.  Threads
+don't survive a fork, so each worker starts its own query log writer.
+"""
+import argparse
+import gc
+import multiprocessing
+import os
+import signal
+import gunicorn.app.base
+import index
+from index import model, querylog
+
+# 1 from the time a reload is asked for until the master has read the
+# files, in memory shared with the workers
+reload_pending = multiprocessing.Value("b", 0)
+
+
+class PreforkServer(gunicorn.app.base.BaseApplication):
+    """Gunicorn server of the already loaded index app."""
+
+    def __init__(self, bind):
+        """Serve on bind, a gunicorn address such as 0.0.0.0:8001."""
+        self.bind = bind
+        super().__init__()
+
+    def init(self, parser, opts, args):
+        """Use the settings of load_config() rather than a command line."""
+
+    def load_config(self):
+        """Set the gunicorn settings from the app config."""
+        config = index.app.config
+        self.cfg.set("bind", self.bind)
+        self.cfg.set("workers", config["INDEX_WORKERS"])
+        self.cfg.set("worker_class", "gthread")
+        self.cfg.set("threads", config["INDEX_WORKER_THREADS"])
+        self.cfg.set("when_ready", when_ready)
+        self.cfg.set("post_fork", post_fork)
+        self.cfg.set("on_reload", on_reload)
+
+    def load(self):
+        """Return the app, loaded before any worker is forked."""
+        return index.app
+
+
+def when_ready(_server):
+    """Freeze the loaded data before the workers are forked, and watch it."""
+    gc.freeze()
+    model.start_watching(replace_workers)
+
+
+def replace_workers():
+    """Make gunicorn fork new workers from the data of the master."""
+    with reload_pending.get_lock():
+        reload_pending.value = 1
+    os.kill(os.getpid(), signal.SIGHUP)
+
+
+def request_reload():
+    """Ask the master to reload, return False if a reload is pending."""
+    with reload_pending.get_lock():
+        if reload_pending.value:
+            return False
+        reload_pending.value = 1
+    os.kill(os.getppid(), signal.SIGHUP)
+    return True
+
+
+def on_reload(_server):
+    """Read the data files that changed before new workers are forked."""
+    try:
+        gc.unfreeze()
+        model.reload(changed_only=True)
+        gc.freeze()
+    finally:
+        with reload_pending.get_lock():
+            reload_pending.value = 0
+
+
+def post_fork(_server, _worker):
+    """Start the threads of the new worker."""
+    model.prefork["request_reload"] = request_reload
+    querylog.start()
+
+
+def main():
+    """Serve on the host and port given on the command line."""
+    parser = argparse.ArgumentParser(
+        description="Serve the index with pre-forked worker processes."
+    )
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+    PreforkServer(f"{args.host}:{args.port}").run()
+
+
+if __name__ == "__main__":
+    main()
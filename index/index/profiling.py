@@ -0,0 +1,78 @@
+"""Profile hits requests with cProfile.
+
+profile=1 on /api/v1/hits/ runs an admin's request under the profiler and
+adds the functions with the most cumulative time to the response.  With
+PROFILE_SAMPLE_RATE = N, one in N hits requests is profiled as well and its
+report is kept in memory, GET /api/v1/profiles returns the latest ones.
+
+Profiled requests skip the cache lookups, so that the report shows the work
+the query takes rather than a cache hit.  Only one request is profiled at a
+time, a sampled request that finds the profiler busy is not profiled.
+"""
+import collections
+import cProfile
+import itertools
+import pstats
+import threading
+import time
+import index
+from index import metrics
+
+# Reports of the sampled requests, oldest first
+reports = collections.deque(maxlen=index.app.config["PROFILE_KEEP"])
+
+# Requests seen by sampled()
+requests_seen = itertools.count(1)
+
+# Held while a request is being profiled
+profiler_lock = threading.Lock()
+
+
+def sampled():
+    """Return True for one in PROFILE_SAMPLE_RATE calls."""
+    return metrics.sampled(index.app.config["PROFILE_SAMPLE_RATE"],
+                           requests_seen)
+
+
+def run(function, args, wait=True):
+    """Call function(*args) under the profiler.
+
+    Return the result and the report of the call.  The report is None when
+    wait is False and another request is being profiled.
+    """
+    if not wait and profiler_lock.locked():
+        return function(*args), None
+    with profiler_lock:
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        result = profiler.runcall(function, *args)
+        elapsed = time.perf_counter() - start
+    return result, {
+        "time": time.time(),
+        "seconds": elapsed,
+        "functions": top_functions(profiler,
+                                   index.app.config["PROFILE_TOP_FUNCTIONS"]),
+    }
+
+
+def top_functions(profiler, limit):
+    """Return the limit functions with the most cumulative time."""
+    stats = pstats.Stats(profiler).sort_stats("cumulative")
+    functions = []
+    for key in stats.fcn_list[:limit]:
+        primitive_calls, calls, total_time, cumulative_time, _ = \
+            stats.stats[key]
+        filename, line, name = key
+        functions.append({
+            "function": f"{filename}:{line}({name})",
+            "calls": calls,
+            "primitive_calls": primitive_calls,
+            "total_seconds": total_time,
+            "cumulative_seconds": cumulative_time,
+        })
+    return functions
+
+
+def store(request_path, report):
+    """Keep the report of a sampled request."""
+    reports.append(dict(report, request=request_path))
@@ -0,0 +1,87 @@
+"""Structured log of hits queries, for cache warmup and replay benchmarks.
+
+With QUERY_LOG_FILENAME set, one in QUERY_LOG_SAMPLE_RATE hits requests is
+written to it as a line of JSON:
+
+    {"time": 1618000000.0, "query": "world flags", "weight": 0.5,
+     "mode": "and", "offset": 0, "limit": 10, "hits": 10,
+     "latency_ms": 1.8, "cache": "result"}
+
+cache is "result" when the page of hits was cached, "tfidf" when only the
+scores of the matches were and "miss" otherwise.  A request only puts the
+record on a queue, a QueueListener thread formats and writes it, so a slow
+disk never delays a query.
+"""
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import time
+import index
+from index import metrics
+
+# Records go through this logger to the queue, never to the root logger
+logger = logging.getLogger("index.querylog")
+logger.propagate = False
+logger.setLevel(logging.INFO)
+
+# Writer thread, started by start()
+state = {"listener": None}
+
+# Requests seen by log()
+requests_seen = itertools.count(1)
+
+
+class JSONFormatter(logging.Formatter):
+    """Format a query record as one line of JSON."""
+
+    def format(self, record):
+        """Return the JSON of the query fields of record."""
+        return json.dumps(record.query)
+
+
+def start():
+    """Start writing the log, if QUERY_LOG_FILENAME is set."""
+    filename = index.app.config["QUERY_LOG_FILENAME"]
+    if filename is None or state["listener"] is not None:
+        return
+    handler = logging.FileHandler(filename, encoding="utf-8", delay=True)
+    handler.setFormatter(JSONFormatter())
+    records = queue.SimpleQueue()
+    state["listener"] = logging.handlers.QueueListener(records, handler)
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    state["listener"].start()
+    atexit.register(stop)
+
+
+def stop():
+    """Write the queued records and stop the writer thread."""
+    listener = state["listener"]
+    if listener is None:
+        return
+    state["listener"] = None
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+def log(hits_args, seconds, hits, cache):
+    """Log a hits request that took seconds and returned hits hits."""
+    if state["listener"] is None or not metrics.sampled(
+            index.app.config["QUERY_LOG_SAMPLE_RATE"], requests_seen):
+        return
+    logger.info("query", extra={"query": {
+        "time": time.time(),
+        "query": hits_args.query,
+        "weight": hits_args.weight,
+        "mode": hits_args.mode,
+        "offset": hits_args.offset,
+        "limit": hits_args.limit,
+        "hits": hits,
+        "latency_ms": seconds * 1000,
+        "cache": cache,
+    }})
@@ -0,0 +1,114 @@
+"""Vectorized tf-idf and PageRank scoring."""
+import collections
+import numpy as np
+from index.compress import PackedColumn
+
+# Dense per-doc arrays indexed by doc number, see index/binindex.py: docid,
+# square root of the normalization factor and PageRank
+DocTable = collections.namedtuple("DocTable", ["docids", "norms", "ranks"])
+
+
+def column(values, positions):
+    """Gather values[positions] from a posting column without copying it.
+
+    Packed columns only decode the blocks holding positions.
+    """
+    if isinstance(values, PackedColumn):
+        return values.take(positions)
+    return np.asarray(values)[positions]
+
+
+def rank_column(docids, page_rank):
+    """Return the PageRank of each docid, 0 for docs without one."""
+    if not page_rank:
+        return np.zeros(len(docids))
+    keys = np.fromiter(page_rank.keys(), dtype=np.int64, count=len(page_rank))
+    values = np.fromiter(page_rank.values(), dtype=float,
+                         count=len(page_rank))
+    order = np.argsort(keys)
+    keys = keys[order]
+    values = values[order]
+    found = np.searchsorted(keys, docids).clip(max=len(keys) - 1)
+    return np.where(keys[found] == docids, values[found], 0.0)
+
+
+def doc_table(inverted_index, page_rank):
+    """Return the DocTable of the docs of inverted_index."""
+    docids, norms = (np.asarray(values)
+                     for values in inverted_index.documents())
+    return DocTable(docids, norms, rank_column(docids, page_rank))
+
+
+def tfidf_scores(query_dict, postings, positions, norms):
+    """Return the cosine similarity of the query and each matched document.
+
+    query_dict maps each query word to its count in the query, postings maps
+    it to its PostingList and positions to the positions of the matched
+    documents in that PostingList.  norms are the DocTable norms of the
+    matched documents.  The query vector is computed once and the document
+    vectors for all matches are gathered into a terms x docs matrix, so the
+    cost is a few array operations per query word.
+    """
+    keys = list(query_dict)
+    idfs = np.array([postings[key].idf for key in keys])
+
+    # q: <term frequency in query> * <idf>
+    query_vector = np.array([query_dict[key] for key in keys]) * idfs
+    norm_q = np.sqrt(query_vector @ query_vector)
+
+    # d: <term frequency in document> * <idf>
+    positions = {key: np.asarray(positions[key], dtype=np.intp)
+                 for key in keys}
+    document_vectors = np.stack([
+        column(postings[key].tfs, positions[key]) for key in keys
+    ]) * idfs[:, np.newaxis]
+    return (query_vector @ document_vectors) / (norm_q * norms)
+
+
+def union_tfidf_scores(query_dict, postings, norms):
+    """Return the docs having any query word and their cosine similarity.
+
+    Like tfidf_scores(), but over the union of the posting lists, and norms
+    is the whole DocTable norms column.  A query word missing from a
+    document adds nothing to the dot product, so each posting contributes
+    <q_t> * <d_t> to its own document and the contributions are summed per
+    doc.  Every posting is visited once.
+    """
+    keys = list(postings)
+    idfs = np.array([postings[key].idf for key in keys])
+    query_vector = np.array([query_dict[key] for key in keys]) * idfs
+    norm_q = np.sqrt(query_vector @ query_vector)
+
+    docs = np.concatenate([np.asarray(postings[key].docs) for key in keys])
+    products = np.concatenate([
+        np.asarray(postings[key].tfs) * (query_weight * idf)
+        for key, query_weight, idf in zip(keys, query_vector, idfs)
+    ])
+    matches, inverse = np.unique(docs, return_inverse=True)
+    dots = np.bincount(inverse, weights=products, minlength=len(matches))
+    if norm_q == 0:
+        return matches, np.zeros(len(matches))
+    return matches, dots / (norm_q * column(norms, matches))
+
+
+def weighted_scores(weight, tfidf, ranks):
+    """Blend PageRank and tf-idf: w * pagerank + (1 - w) * tfidf."""
+    return weight * ranks + (1 - weight) * tfidf
+
+
+def top_k(scores, k=None):
+    """Return the indices of the k highest scores, highest score first.
+
+    Only the k selected scores are sorted, the rest are split off with a
+    linear time partition.  Ties keep index order, so any k gives a prefix
+    of the full ranking.  k=None ranks every score.
+    """
+    if k is None or k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    if k <= 0:
+        return np.arange(0)
+    kth_score = -np.partition(-scores, k - 1)[k - 1]
+    above = np.flatnonzero(scores > kth_score)
+    ties = np.flatnonzero(scores == kth_score)[:k - len(above)]
+    top = np.concatenate([above, ties])
+    return top[np.argsort(-scores[top], kind="stable")]
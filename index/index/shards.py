@@ -0,0 +1,122 @@
+"""Document range sharding of the index across index servers.
+
+Every shard server loads the same data files and keeps the postings of one
+range of docids, see doc_range().  The idfs in the inverted index are
+computed over the whole collection and the other factors of a doc's score
+only depend on that doc, so a shard scores its docs exactly as an unsharded
+server would.  A coordinator server holds no data: it sends each query to
+every shard at once and merges their top hits.
+"""
+import concurrent.futures
+import heapq
+import itertools
+import requests
+
+
+def doc_range(docids, number, count):
+    """Return the [low, high) docid range of shard number out of count.
+
+    docids are the docids of the inverted index, see model.select_shard().
+    The ranges split them into count contiguous ranges of about the same
+    number of docs.  Without docids, the last shard gets the whole range and
+    the others an empty one.
+    """
+    docids = sorted(docids)
+    if not docids:
+        cuts = [0] * count + [2 ** 32]
+    else:
+        cuts = [0] + [docids[len(docids) * item // count]
+                      for item in range(1, count)] + [2 ** 32]
+    return cuts[number], cuts[number + 1]
+
+
+def merge_hits(hit_lists, offset=0, limit=None):
+    """Merge ranked hit lists into one ranking and return a page of it.
+
+    Each list is sorted by decreasing score, ties by increasing docid, like
+    the hits of a single server.
+    """
+    merged = heapq.merge(
+        *hit_lists, key=lambda hit: (-hit["score"], hit["docid"])
+    )
+    end = None if limit is None else offset + limit
+    return list(itertools.islice(merged, offset, end))
+
+
+class Coordinator:
+    """Send requests to every shard concurrently."""
+
+    def __init__(self, urls, timeout):
+        """Use the shards whose /api/v1/ URLs are urls."""
+        self.urls = urls
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=len(urls), thread_name_prefix="shard"
+        )
+
+    def fan_out(self, method, route, **kwargs):
+        """Send a request to every shard, return the responses in order.
+
+        kwargs are passed on to requests.  Raises requests.RequestException
+        if a shard can't be reached.
+        """
+        futures = [
+            self.executor.submit(self.session.request, method, url + route,
+                                 timeout=self.timeout, **kwargs)
+            for url in self.urls
+        ]
+        return [future.result() for future in futures]
+
+    def get(self, route, params=None):
+        """GET route from every shard, return the responses in shard order."""
+        return self.fan_out("GET", route, params=params)
+
+    def hits(self, hits_args):
+        """Return the merged page of hits of every shard for hits_args.
+
+        Raises requests.RequestException if a shard fails.
+        """
+        hit_lists = []
+        for response in self.get("hits/", shard_params(hits_args)):
+            response.raise_for_status()
+            hit_lists.append(response.json()["hits"])
+        return merge_hits(hit_lists, hits_args.offset, hits_args.limit)
+
+    def hits_batch(self, batch):
+        """Return the merged results of every shard for a batch.
+
+        batch is a list of HitsArgs, or None for invalid queries.  Raises
+        requests.RequestException if a shard fails.
+        """
+        valid = [hits_args for hits_args in batch if hits_args is not None]
+        shard_results = []
+        for response in self.fan_out(
+                "POST", "hits/batch",
+                json=[shard_params(hits_args) for hits_args in valid]):
+            response.raise_for_status()
+            shard_results.append(iter(response.json()["results"]))
+
+        results = []
+        for hits_args in batch:
+            if hits_args is None:
+                results.append({"message": "Bad Request", "status_code": 400})
+                continue
+            hit_lists = [next(shard)["hits"] for shard in shard_results]
+            results.append({"hits": merge_hits(
+                hit_lists, hits_args.offset, hits_args.limit
+            )})
+        return results
+
+
+def shard_params(hits_args):
+    """Return the parameters asking a shard for what hits_args needs.
+
+    Each shard returns its top offset + limit hits, which includes every
+    hit of the page that is in its doc range.
+    """
+    params = {"q": hits_args.query, "w": hits_args.weight,
+              "mode": hits_args.mode, "offset": 0}
+    if hits_args.limit is not None:
+        params["limit"] = hits_args.offset + hits_args.limit
+    return params
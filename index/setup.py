@@ -14,11 +14,13 @@ setup(
     include_package_data=True,
     install_requires=[
         'Flask',
+        'gunicorn',
+        'numpy',
         'pycodestyle',
         'pydocstyle',
         'pylint',
         'pytest',
         'requests',
     ],
-    python_requires='>=3.6',
+    python_requires='>=3.7',
 )
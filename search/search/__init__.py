@@ -21,3 +21,6 @@ app.config.from_envvar('SEARCH_SETTINGS', silent=True)
 # going to tell pylint and pycodestyle to ignore this coding style violation.
 import search.views  # noqa: E402  pylint: disable=wrong-import-position
 import search.model  # noqa: E402  pylint: disable=wrong-import-position
+
+# Fill the document cache before the first search, see search/model.py
+search.model.preload_documents()
@@ -0,0 +1,156 @@
+"""Serve the search pages asynchronously with an ASGI server.
+
+$ uvicorn search.asgi:app --host 0.0.0.0 --port 8000
+
+A search is a coroutine: the request to the index server is awaited on a
+shared aiohttp session, and the database lookups run in a pool of
+SEARCH_DB_THREADS threads, so one process keeps hundreds of searches in
+flight while they wait on the index server.  Every other request, such as
+static files or a search missing its parameters, is passed on to the Flask
+app.
+
+Pages go through the page cache of the Flask app, see search/pagecache.py.
+A page that isn't cached is rendered by a coroutine, and a stale page is
+rendered again by the cache's background threads with the Flask view.
+"""
+import asyncio
+import concurrent.futures
+import threading
+import aiohttp
+from asgiref.wsgi import WsgiToAsgi
+import flask
+from werkzeug.urls import url_decode
+import search
+from search import model, pagecache
+
+# The Flask app, for the requests that aren't searches
+flask_app = WsgiToAsgi(search.app)
+
+# Session to the index server, opened by the first search so that it
+# belongs to the server's event loop
+clients = {"index": None}
+
+# Database lookups run in these threads, each with its own connection
+db_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=search.app.config["SEARCH_DB_THREADS"],
+    thread_name_prefix="search-db",
+)
+db_connections = threading.local()
+
+
+async def app(scope, receive, send):
+    """Serve one ASGI connection."""
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    args = search_args(scope)
+    if args is None:
+        await flask_app(scope, receive, send)
+        return
+    body = (await search_page(scope, *args)).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", b"text/html; charset=utf-8"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+    })
+    # A HEAD response only has the headers of the page
+    await send({"type": "http.response.body",
+                "body": b"" if scope["method"] == "HEAD" else body})
+
+
+async def lifespan(receive, send):
+    """Close the index session when the server shuts down."""
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def close():
+    """Close the session to the index server."""
+    session = clients["index"]
+    clients["index"] = None
+    if session is not None:
+        await session.close()
+
+
+def search_args(scope):
+    """Return the query and weight of a search request, None otherwise."""
+    if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD") \
+            or scope["path"] != "/":
+        return None
+    args = url_decode(scope["query_string"])
+    if "q" not in args or "w" not in args:
+        return None
+    return args["q"], args["w"]
+
+
+async def search_page(scope, query, weight):
+    """Return the results page of a search, cached if possible."""
+    key = pagecache.page_key(query, weight)
+    if key is None:
+        return await render_page(scope, query, weight)
+    page = pagecache.cached(key, search.views.index.render_page,
+                            [query, weight])
+    if page is not None:
+        return page
+    try:
+        page = await render_page(scope, query, weight)
+    except aiohttp.ClientError:
+        page = pagecache.fallback(key)
+        if page is None:
+            raise
+        return page
+    pagecache.store(key, page)
+    return page
+
+
+async def render_page(scope, query, weight):
+    """Return the results page of a search."""
+    hits = await index_hits(query, weight)
+    # Only the first 10 hits are shown
+    results = await asyncio.get_running_loop().run_in_executor(
+        db_executor, lookup_documents, [hit["docid"] for hit in hits[:10]]
+    )
+    content = {"results": results, "ifempty": 0 if results else 1}
+
+    # Rendering is synchronous, the request context must not span an await
+    with search.app.test_request_context(
+            scope["path"], query_string=scope["query_string"]):
+        return flask.render_template("index.html", **content)
+
+
+async def index_hits(query, weight):
+    """Return the hits of the index server for a search."""
+    config = search.app.config
+    if clients["index"] is None:
+        clients["index"] = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=config["SEARCH_INDEX_CONNECTIONS"]
+            ),
+            timeout=aiohttp.ClientTimeout(
+                sock_connect=config["INDEX_API_CONNECT_TIMEOUT"],
+                sock_read=config["INDEX_API_READ_TIMEOUT"],
+            ),
+            # An error of the index server fails the search, as it does
+            # with the Flask app
+            raise_for_status=True,
+        )
+    params = {"q": query, "w": weight, "limit": 10}
+    async with clients["index"].get(config["INDEX_API_URL"],
+                                    params=params) as response:
+        return (await response.json())["hits"]
+
+
+def lookup_documents(docids):
+    """Look docids up with the connection of the current thread."""
+    if not hasattr(db_connections, "connection"):
+        db_connections.connection = model.connect()
+    return model.lookup_documents(db_connections.connection, docids)
@@ -0,0 +1,104 @@
+"""In-process caches for the search server."""
+import collections
+import sys
+import threading
+
+
+def row_size(row):
+    """Return an estimate of the bytes a row dictionary takes."""
+    return sys.getsizeof(row) + sum(sys.getsizeof(value)
+                                    for value in row.values())
+
+
+class LRUCache:
+    """Values by key, evicting the least recently used.
+
+    Each value weighs sizeof(value), 1 by default, and the cache holds at
+    most maxsize of weight.  A value heavier than that is not cached.  Safe
+    to share between threads, counts the keys found and not found.
+    """
+
+    def __init__(self, maxsize, sizeof=None):
+        """Create an empty cache holding at most maxsize of weight."""
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._sizeof = sizeof or (lambda value: 1)
+        self._weight = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the value cached for key, or None."""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """Return {key: value} for the keys that are cached."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                found[key] = entry[0]
+        return found
+
+    def put(self, key, value):
+        """Cache value for key, evicting the least recently used values."""
+        weight = self._sizeof(value)
+        if weight > self.maxsize:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._weight -= old[1]
+            self._entries[key] = (value, weight)
+            self._weight += weight
+            while self._weight > self.maxsize:
+                _, (_, evicted_weight) = self._entries.popitem(last=False)
+                self._weight -= evicted_weight
+
+    def stats(self):
+        """Return the entries and weight held, and the hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "weight": self._weight,
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class DocumentCache:
+    """Documents rows by docid, evicting the least recently used.
+
+    Bounded by an estimate of the bytes the rows take rather than by their
+    number, since summaries vary in length.  model.preload_documents() fills
+    it with the top documents by PageRank at startup, searches then keep the
+    documents they show.  Searches in parallel threads share one cache.
+    """
+
+    def __init__(self, maxbytes):
+        """Create an empty cache holding about maxbytes of rows."""
+        self._rows = LRUCache(maxbytes, row_size)
+
+    def get_many(self, docids):
+        """Return {docid: row} for the docids that are cached."""
+        return self._rows.get_many(docids)
+
+    def put(self, row):
+        """Cache row, evicting the least recently used rows."""
+        self._rows.put(row["docid"], row)
+
+    def stats(self):
+        """Return the rows and bytes held, and how many docids were found."""
+        stats = self._rows.stats()
+        stats["bytes"] = stats.pop("weight")
+        stats["maxbytes"] = stats.pop("maxsize")
+        return stats
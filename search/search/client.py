@@ -0,0 +1,67 @@
+"""Pooled keep-alive HTTP client to the index server.
+
+Searches share one requests session, so a search reuses an open connection
+to the index server rather than paying for a new TCP handshake.  The pool
+keeps up to SEARCH_INDEX_CONNECTIONS connections, one per thread searching
+at the same time.
+"""
+import threading
+import urllib.parse
+from requests.adapters import HTTPAdapter
+import requests
+import search
+
+# Session to the index server, created by the first search
+clients = {"index": None}
+clients_lock = threading.Lock()
+
+
+def session():
+    """Return the session to the index server."""
+    with clients_lock:
+        if clients["index"] is None:
+            pool_size = search.app.config["SEARCH_INDEX_CONNECTIONS"]
+            adapter = HTTPAdapter(pool_connections=1,
+                                  pool_maxsize=pool_size)
+            clients["index"] = requests.Session()
+            clients["index"].mount("http://", adapter)
+            clients["index"].mount("https://", adapter)
+        return clients["index"]
+
+
+def hits(query, weight, limit):
+    """Return the top limit hits of the index server for a search.
+
+    Raises requests.RequestException if the index server fails.
+    """
+    config = search.app.config
+    response = session().get(
+        config["INDEX_API_URL"],
+        params={"q": query, "w": weight, "limit": limit},
+        timeout=(config["INDEX_API_CONNECT_TIMEOUT"],
+                 config["INDEX_API_READ_TIMEOUT"]),
+    )
+    response.raise_for_status()
+    return response.json()["hits"]
+
+
+def stats():
+    """Return how many requests to the index server reused a connection."""
+    url = urllib.parse.urlsplit(search.app.config["INDEX_API_URL"])
+    address = (url.hostname,
+               url.port or (443 if url.scheme == "https" else 80))
+    requests_sent = 0
+    connections = 0
+    pools = session().get_adapter(url.geturl()).poolmanager.pools
+    for key in pools.keys():
+        pool = pools[key]
+        if (pool.host, pool.port) == address:
+            requests_sent += pool.num_requests
+            connections += pool.num_connections
+    return {
+        "requests": requests_sent,
+        "connections": connections,
+        "reuse_ratio": (
+            1 - connections / requests_sent if requests_sent else 0.0
+        ),
+    }
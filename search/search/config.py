@@ -10,3 +10,40 @@ SEARCH_ROOT = pathlib.Path(__file__).resolve().parent
 # Database file is var/wikipedia.sqlite3
 DATABASE_FILENAME = SEARCH_ROOT/'var'/'wikipedia.sqlite3'
 INDEX_API_URL = "http://localhost:8001/api/v1/hits/"
+
+# Read-only database connections, see search/model.py.  Up to
+# SEARCH_DB_POOL_SIZE idle connections stay open between requests.  Each
+# memory maps up to SEARCH_DB_MMAP_SIZE bytes of the database file and
+# caches up to SEARCH_DB_CACHE_KIB KiB of pages.
+SEARCH_DB_POOL_SIZE = 8
+SEARCH_DB_MMAP_SIZE = 256 * 1024 * 1024
+SEARCH_DB_CACHE_KIB = 16 * 1024
+
+# Document rows cached in memory, see search/cache.py.  The cache holds
+# about SEARCH_DOC_CACHE_BYTES bytes of rows.  At startup it is filled with
+# the SEARCH_DOC_CACHE_PRELOAD documents with the highest PageRank in
+# PAGERANK_FILENAME, 0 disables preloading.
+SEARCH_DOC_CACHE_BYTES = 64 * 1024 * 1024
+SEARCH_DOC_CACHE_PRELOAD = 0
+PAGERANK_FILENAME = SEARCH_ROOT.parent.parent/'index'/'index'/'pagerank.out'
+
+# Rendered results pages, see search/pagecache.py.  Up to
+# SEARCH_PAGE_CACHE_SIZE pages are cached.  A page is served as is for
+# SEARCH_PAGE_CACHE_TTL seconds, then for SEARCH_PAGE_CACHE_STALE more
+# seconds while it is rendered again in the background.  0 pages disables
+# the cache.
+SEARCH_PAGE_CACHE_SIZE = 1024
+SEARCH_PAGE_CACHE_TTL = 60
+SEARCH_PAGE_CACHE_STALE = 600
+
+# Connections to the index server, see search/client.py.  Searches share a
+# pool of at most SEARCH_INDEX_CONNECTIONS keep-alive connections, and wait
+# INDEX_API_CONNECT_TIMEOUT seconds to connect and INDEX_API_READ_TIMEOUT
+# seconds for the hits.
+SEARCH_INDEX_CONNECTIONS = 100
+INDEX_API_CONNECT_TIMEOUT = 3.05
+INDEX_API_READ_TIMEOUT = 10
+
+# Asynchronous serving mode, see search/asgi.py.  Searches run their
+# database lookups in SEARCH_DB_THREADS threads.
+SEARCH_DB_THREADS = 4
@@ -1,7 +1,20 @@
 """Insta485 model (database) API."""
+import heapq
+import pathlib
+import queue
 import sqlite3
 import flask
 import search
+from search.cache import DocumentCache
+
+# Idle read-only connections kept open between requests, see get_db()
+idle_connections = queue.LifoQueue()
+
+# Rows of recently shown documents, see lookup_documents()
+document_cache = DocumentCache(search.app.config['SEARCH_DOC_CACHE_BYTES'])
+
+# Most variables SQLite accepts in one statement
+MAX_VARIABLES = 999
 
 
 def dict_factory(cursor, row):
@@ -14,32 +27,121 @@ def dict_factory(cursor, row):
 
 
 def get_db():
-    """Open a new database connection.
+    """Return a database connection for the request.
+
+    The search server only reads, so connections are opened read-only and
+    reused by later requests rather than closed, which keeps their page
+    cache and prepared statements warm.
 
     Flask docs:
     https://flask.palletsprojects.com/en/1.0.x/appcontext/#storing-data
     """
     if 'sqlite_db' not in flask.g:
-        db_filename = search.search.app.config['DATABASE_FILENAME']
-        flask.g.sqlite_db = sqlite3.connect(str(db_filename))
-        flask.g.sqlite_db.row_factory = dict_factory
-
-        # Foreign keys have to be enabled per-connection.  This is an sqlite3
-        # backwards compatibility thing.
-        flask.g.sqlite_db.execute("PRAGMA foreign_keys = ON")
+        try:
+            flask.g.sqlite_db = idle_connections.get_nowait()
+        except queue.Empty:
+            flask.g.sqlite_db = connect()
 
     return flask.g.sqlite_db
 
 
+def connect():
+    """Open a read-only database connection returning rows as dictionaries.
+
+    Connections may be used by any thread, one at a time.
+    """
+    config = search.app.config
+    db_filename = pathlib.Path(config['DATABASE_FILENAME']).resolve()
+    db_uri = db_filename.as_uri() + "?mode=ro"
+    connection = sqlite3.connect(db_uri, uri=True, check_same_thread=False)
+    connection.row_factory = dict_factory
+    connection.execute("PRAGMA query_only = ON")
+    connection.execute(f"PRAGMA mmap_size = {config['SEARCH_DB_MMAP_SIZE']:d}")
+    connection.execute(
+        f"PRAGMA cache_size = {-config['SEARCH_DB_CACHE_KIB']:d}"
+    )
+    return connection
+
+
+def lookup_documents(connection, docids):
+    """Return the Documents rows of docids, in order.
+
+    Rows come from the document cache when it has them, one query fetches
+    the others.  Docids missing from the database are skipped.
+    """
+    rows = document_cache.get_many(docids)
+    missing = [docid for docid in docids if docid not in rows]
+    if missing:
+        for row in fetch_documents(connection, missing):
+            document_cache.put(row)
+            rows[row['docid']] = row
+    return [rows[docid] for docid in docids if docid in rows]
+
+
+def fetch_documents(connection, docids):
+    """Return the Documents rows of docids, in no particular order.
+
+    Only the columns the results page shows are selected.
+    """
+    placeholders = ",".join("?" * len(docids))
+    cur = connection.execute(
+        "SELECT docid, title, summary, url FROM Documents "
+        f"WHERE docid IN ({placeholders})",
+        docids,
+    )
+    return cur.fetchall()
+
+
+def preload_documents():
+    """Cache the documents with the highest PageRank.
+
+    Errors are logged rather than raised, the cache then fills up from
+    searches.
+    """
+    config = search.app.config
+    count = config['SEARCH_DOC_CACHE_PRELOAD']
+    if count <= 0:
+        return
+    try:
+        with open(config['PAGERANK_FILENAME'], encoding='utf-8') as pagerank:
+            top = heapq.nlargest(
+                count,
+                (line.split(',') for line in pagerank if line.strip()),
+                key=lambda item: float(item[1]),
+            )
+        # Lowest rank first, so that the top documents are evicted last
+        docids = [int(docid) for docid, _ in reversed(top)]
+        connection = connect()
+        try:
+            for start in range(0, len(docids), MAX_VARIABLES):
+                chunk = docids[start:start + MAX_VARIABLES]
+                rows = {row['docid']: row
+                        for row in fetch_documents(connection, chunk)}
+                for docid in chunk:
+                    if docid in rows:
+                        document_cache.put(rows[docid])
+        finally:
+            connection.close()
+    except (OSError, ValueError, sqlite3.Error) as error:
+        search.app.logger.warning("Document cache preload failed: %s", error)
+
+
 @search.app.teardown_appcontext
 def close_db(error):
-    """Close the database at the end of a request.
+    """Return the database connection to the pool at the end of a request.
+
+    There is nothing to commit.  A request that failed closes its
+    connection, and so does one that finds SEARCH_DB_POOL_SIZE connections
+    idle already.
 
     Flask docs:
     https://flask.palletsprojects.com/en/1.0.x/appcontext/#storing-data
     """
-    assert error or not error  # Needed to avoid superfluous style error
     sqlite_db = flask.g.pop('sqlite_db', None)
-    if sqlite_db is not None:
-        sqlite_db.commit()
+    if sqlite_db is None:
+        return
+    if error is None and idle_connections.qsize() < \
+            search.app.config['SEARCH_DB_POOL_SIZE']:
+        idle_connections.put(sqlite_db)
+    else:
         sqlite_db.close()
@@ -0,0 +1,159 @@
+"""Cache of rendered results pages, refreshed in the background.
+
+Pages are keyed by the normalized query and the weight, so "World  Flags"
+and "world flags" share a page.  A page younger than SEARCH_PAGE_CACHE_TTL
+seconds is served as is.  Up to SEARCH_PAGE_CACHE_STALE seconds later it is
+still served, and a background thread renders it again for the next
+search.  Older pages are rendered again before answering, unless the index
+server is slow or down, in which case the old page is served rather than an
+error.
+"""
+import collections
+import concurrent.futures
+import re
+import threading
+import time
+import requests
+import search
+from search.cache import LRUCache
+
+# Background renders of stale pages
+refresh_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=2, thread_name_prefix="search-refresh"
+)
+
+
+def page_key(query, weight):
+    """Return the cache key of a search, None if it can't be cached."""
+    try:
+        weight = float(weight)
+    except ValueError:
+        return None
+    words = re.sub(r'[^a-zA-Z0-9 ]+', '', query).lower().split()
+    return " ".join(words), weight
+
+
+class PageCache:
+    """Rendered pages by key with the time they were rendered.
+
+    The pages are kept in a cache.LRUCache of maxsize pages.  Counts how each
+    page was served, and renders a stale page again at most once at a time.
+    """
+
+    def __init__(self, maxsize):
+        """Create an empty cache holding at most maxsize pages."""
+        self.counts = collections.Counter()
+        self._pages = LRUCache(maxsize)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the page cached for key and its age in seconds, or None."""
+        entry = self._pages.get(key)
+        if entry is None:
+            return None
+        return entry[0], time.monotonic() - entry[1]
+
+    def put(self, key, page):
+        """Cache page for key, evicting the least recently used pages."""
+        self._pages.put(key, (page, time.monotonic()))
+
+    def count(self, outcome):
+        """Count a page served with outcome."""
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def refresh(self, key, render, args):
+        """Render the page of key again in the background.
+
+        Does nothing if the page is already being rendered.
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self.put(key, render(*args))
+                self.count("refreshed")
+            except requests.RequestException as error:
+                search.app.logger.warning("Page refresh failed: %s", error)
+            except Exception:  # pylint: disable=broad-except
+                # Nothing reads the future, log the error here
+                search.app.logger.exception("Page refresh failed")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+        refresh_executor.submit(run)
+
+    def stats(self):
+        """Return size and how pages were served."""
+        pages = self._pages.stats()
+        with self._lock:
+            served = sum(self.counts[outcome] for outcome in
+                         ("fresh", "stale", "fallback", "miss"))
+            hits = served - self.counts["miss"]
+            return dict(self.counts, size=pages["size"],
+                        maxsize=pages["maxsize"],
+                        hit_ratio=hits / served if served else 0.0)
+
+
+def cached(key, render, args):
+    """Return the page of key if it can be served from the cache, or None.
+
+    A stale page is rendered again in the background with render(*args),
+    which raises requests.RequestException when the index server fails.
+    """
+    config = search.app.config
+    entry = page_cache.get(key)
+    if entry is None:
+        return None
+    page, age = entry
+    if age < config['SEARCH_PAGE_CACHE_TTL']:
+        page_cache.count("fresh")
+        return page
+    if age < config['SEARCH_PAGE_CACHE_TTL'] + \
+            config['SEARCH_PAGE_CACHE_STALE']:
+        page_cache.count("stale")
+        page_cache.refresh(key, render, args)
+        return page
+    return None
+
+
+def fallback(key):
+    """Return the old page of key when it can't be rendered, or None."""
+    entry = page_cache.get(key)
+    if entry is None:
+        return None
+    page_cache.count("fallback")
+    return entry[0]
+
+
+def store(key, page):
+    """Cache the page of key, rendered because it wasn't cached."""
+    page_cache.count("miss")
+    page_cache.put(key, page)
+
+
+def serve(key, render, args):
+    """Return the page of key, calling render(*args) when it must be drawn.
+
+    render raises requests.RequestException when the index server fails.
+    """
+    page = cached(key, render, args)
+    if page is not None:
+        return page
+    try:
+        page = render(*args)
+    except requests.RequestException:
+        page = fallback(key)
+        if page is None:
+            raise
+        return page
+    store(key, page)
+    return page
+
+
+# Rendered results pages
+page_cache = PageCache(search.app.config['SEARCH_PAGE_CACHE_SIZE'])
@@ -1,2 +1,3 @@
 """Init."""
 from search.views.index import result
+from search.views.stats import stats
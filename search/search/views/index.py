@@ -1,33 +1,37 @@
 """Search view."""
 import flask
 from flask import request
-import requests
 import search
+from search import client, pagecache
 
 
 @search.app.route('/', methods=['GET'])
 def result():
     """Search result."""
-    content = {'results': [], 'ifempty': 1}
-    if bool(request.args):
-        query = request.args['q']
-        weight = request.args['w']
-        connection = search.search.model.get_db()
-        url = search.app.config["INDEX_API_URL"]
-        res = requests.get(url + '?w='
-                           + weight + '&q=' + query)
-        print(res)
-        res = res.json()
-        index = 0
-        print(res)
-        for item in res['hits']:
-            if index > 9:
-                break
-            cur = connection.execute(
-                "SELECT * FROM Documents WHERE docid = ?", (item['docid'],)
-            )
-            content['results'].append(cur.fetchall()[0])
-            index = index + 1
-        if len(content['results']) != 0:
-            content['ifempty'] = 0
-    return flask.render_template("index.html", **content)
+    if not bool(request.args):
+        return flask.render_template("index.html", results=[], ifempty=1)
+    query = request.args['q']
+    weight = request.args['w']
+    key = pagecache.page_key(query, weight)
+    if key is None:
+        return render_results(query, weight)
+    return pagecache.serve(key, render_page, [query, weight])
+
+
+def render_page(query, weight):
+    """Render the results page of a search outside of any request."""
+    with search.app.test_request_context(
+            '/', query_string={'q': query, 'w': weight}):
+        return render_results(query, weight)
+
+
+def render_results(query, weight):
+    """Render the results page of a search."""
+    connection = search.search.model.get_db()
+    # Only the first 10 hits are shown
+    hits = client.hits(query, weight, 10)
+    results = search.model.lookup_documents(
+        connection, [item['docid'] for item in hits[:10]]
+    )
+    return flask.render_template("index.html", results=results,
+                                 ifempty=0 if results else 1)
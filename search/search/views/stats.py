@@ -0,0 +1,12 @@
+"""Search server statistics."""
+import flask
+import search
+from search import client, model, pagecache
+
+
+@search.app.route('/api/v1/stats', methods=['GET'])
+def stats():
+    """Report connection reuse and cache hits."""
+    return flask.jsonify(index_client=client.stats(),
+                         document_cache=model.document_cache.stats(),
+                         page_cache=pagecache.page_cache.stats())
@@ -13,6 +13,8 @@ setup(
     packages=['search'],
     include_package_data=True,
     install_requires=[
+        'aiohttp',
+        'asgiref',
         'bs4',
         'Flask',
         'html5validator',
@@ -21,6 +23,7 @@ setup(
         'pylint',
         'pytest',
         'requests',
+        'uvicorn',
     ],
-    python_requires='>=3.6',
+    python_requires='>=3.7',
 )
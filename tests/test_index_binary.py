@@ -0,0 +1,71 @@
+"""Unit tests for the binary inverted index format."""
+import pathlib
+import pytest
+import utils
+from index.binindex import convert, load_text_index, open_binary_index
+
+
+def test_binary_index_roundtrip():
+    """Convert a text inverted index and compare every posting."""
+    tmpdir = utils.create_and_clean_testdir("tmp", "test_binary_index")
+    text_path = utils.TEST_DIR/"testdata/test_pipeline10/expected.txt"
+    binary_path = pathlib.Path(tmpdir)/"inverted_index.bin"
+    convert(text_path, binary_path)
+    binary_index = open_binary_index(binary_path)
+
+    with text_path.open() as infile:
+        lines = infile.readlines()
+    assert len(binary_index) == len(lines)
+    assert list(binary_index) == sorted(binary_index)
+
+    # Doc numbers follow docid order
+    doc_ids, doc_norms = binary_index.documents()
+    assert list(doc_ids) == sorted(doc_ids)
+
+    for line in lines:
+        term, idf, docs = utils.parse_inverted_index_line(line)
+        assert term in binary_index
+        posting = binary_index[term]
+        assert posting.idf == pytest.approx(idf)
+
+        # Postings are sorted by docid
+        assert [doc_ids[doc] for doc in posting.docs] == \
+            sorted(int(x) for x in docs)
+        for doc, occurrences in zip(posting.docs, posting.tfs):
+            assert occurrences == docs[str(doc_ids[doc])].occurrences
+            assert doc_norms[doc] ** 2 == \
+                pytest.approx(docs[str(doc_ids[doc])].norm)
+
+
+def test_text_index_matches_binary():
+    """Verify the in-memory text index matches the binary index."""
+    tmpdir = utils.create_and_clean_testdir("tmp", "test_binary_index")
+    text_path = utils.TEST_DIR/"testdata/test_pipeline05/expected.txt"
+    binary_path = pathlib.Path(tmpdir)/"inverted_index.bin"
+    convert(text_path, binary_path)
+    binary_index = open_binary_index(binary_path)
+    text_index = load_text_index(text_path)
+
+    assert list(text_index) == list(binary_index)
+    for text_column, binary_column in zip(text_index.documents(),
+                                          binary_index.documents()):
+        assert list(text_column) == list(binary_column)
+    for term in text_index:
+        text_posting = text_index[term]
+        binary_posting = binary_index[term]
+        assert text_posting.idf == binary_posting.idf
+        assert list(text_posting.docs) == list(binary_posting.docs)
+        assert list(text_posting.tfs) == list(binary_posting.tfs)
+
+
+def test_binary_index_missing_term():
+    """Look up terms that are not in the index."""
+    tmpdir = utils.create_and_clean_testdir("tmp", "test_binary_index")
+    binary_path = pathlib.Path(tmpdir)/"inverted_index.bin"
+    convert(utils.TEST_DIR/"testdata/test_pipeline03/expected.txt",
+            binary_path)
+    binary_index = open_binary_index(binary_path)
+    assert "aaaaaaa" not in binary_index
+    assert "" not in binary_index
+    with pytest.raises(KeyError):
+        binary_index["aaaaaaa"]  # pylint: disable=pointless-statement
@@ -0,0 +1,50 @@
+"""Unit tests for disjunctive top-k with block-max bounds."""
+import pathlib
+import random
+import numpy as np
+import utils
+from index import blockmax, scoring
+from index.binindex import load_text_index
+
+
+def exhaustive(query_dict, weight, inverted_index, doc_table):
+    """Rank every doc with any query word."""
+    postings = {key: inverted_index[key] for key in query_dict
+                if key in inverted_index}
+    if not postings:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    docs, tfidf = scoring.union_tfidf_scores(query_dict, postings,
+                                             doc_table.norms)
+    scores = scoring.weighted_scores(weight, tfidf, doc_table.ranks[docs])
+    order = scoring.top_k(scores)
+    return doc_table.docids[docs[order]], scores[order]
+
+
+def test_top_k_matches_exhaustive():
+    """Compare block-max top k with ranking every matching doc."""
+    tmpdir = utils.create_and_clean_testdir("tmp", "test_blockmax")
+    text_path = pathlib.Path(tmpdir)/"inverted_index.txt"
+    rand = random.Random(485)
+    page_rank = utils.write_random_index(text_path, rand)
+    inverted_index = load_text_index(text_path)
+    doc_table = scoring.doc_table(inverted_index, page_rank)
+
+    for block_size in (1, 4, 64, 1000):
+        index_data = {
+            "inverted_index": inverted_index,
+            "doc_table": doc_table,
+            "bounds": blockmax.compute_bounds(inverted_index, doc_table,
+                                              block_size),
+        }
+        for query_dict in [{"alpha": 1}, {"alpha": 2, "beta": 1},
+                           {"beta": 1, "delta": 1, "gamma": 3},
+                           {"gamma": 1, "missing": 1}, {"missing": 1}]:
+            for weight in (0, 0.3, 1):
+                docids, scores = exhaustive(query_dict, weight,
+                                            inverted_index, doc_table)
+                for k in (0, 1, 10, 1000):
+                    top_docids, top_scores = blockmax.top_k(
+                        query_dict, weight, k, index_data
+                    )
+                    assert top_docids.tolist() == docids[:k].tolist()
+                    assert np.allclose(top_scores, scores[:k])
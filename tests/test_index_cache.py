@@ -0,0 +1,57 @@
+"""Unit tests for index server caches."""
+from index.cache import LRUCache
+
+
+def test_lru_eviction():
+    """Verify the least recently used entry is evicted first."""
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+    stats = cache.stats()
+    assert stats["size"] == 2
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+
+
+def test_lru_clear():
+    """Verify clear drops entries but keeps counting."""
+    cache = LRUCache(10)
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    cache.clear()
+    assert cache.get("a") is None
+    assert cache.stats() == {
+        "size": 0,
+        "maxsize": 10,
+        "hits": 1,
+        "misses": 1,
+        "hit_ratio": 0.5,
+    }
+
+
+def test_result_cache(index_client):
+    """Verify repeated queries are served from the result cache."""
+    url = "/api/v1/hits/?q=world+flags&w=0.3"
+    first = index_client.get(url).get_json()
+    hits_before = index_client.get("/api/v1/ready") \
+        .get_json()["result_cache"]["hits"]
+    assert index_client.get(url).get_json() == first
+    assert index_client.get("/api/v1/ready") \
+        .get_json()["result_cache"]["hits"] == hits_before + 1
+
+
+def test_tfidf_cache(index_client):
+    """Verify changing only the weight reuses the tf-idf of the query."""
+    index_client.get("/api/v1/hits/?q=world+flags&w=0.1")
+    hits_before = index_client.get("/api/v1/ready") \
+        .get_json()["tfidf_cache"]["hits"]
+    response = index_client.get("/api/v1/hits/?q=flags+world&w=0.9")
+    assert response.status_code == 200
+    assert index_client.get("/api/v1/ready") \
+        .get_json()["tfidf_cache"]["hits"] == hits_before + 1
@@ -0,0 +1,96 @@
+"""Unit tests for compressed posting lists."""
+import array
+import pathlib
+import random
+import numpy as np
+import utils
+from index import blockmax, compress, scoring
+from index.binindex import load_text_index
+from index.postings import intersect
+
+
+def test_pack_round_trip():
+    """Verify packed lists decode to the original docs and tfs."""
+    rand = random.Random(485)
+    post_offsets = [0]
+    docs = array.array("I")
+    tfs = array.array("I")
+    for size in (0, 1, 7, 8, 9, 100, 1000):
+        # Mix dense runs, big gaps and big tfs
+        doc_numbers = sorted(rand.sample(range(2 ** 32 - 1), size // 2) +
+                             rand.sample(range(1000), size - size // 2))
+        doc_numbers = sorted(set(doc_numbers))
+        docs.extend(doc_numbers)
+        tfs.extend(rand.choice([1, 1, 2, 2 ** 31]) for _ in doc_numbers)
+        post_offsets.append(len(docs))
+
+    packed = compress.pack(post_offsets, docs, tfs, 8)
+    for number, (start, end) in enumerate(zip(post_offsets,
+                                              post_offsets[1:])):
+        for field, values in (("docs", docs), ("tfs", tfs)):
+            column = compress.PackedColumn(packed, number, end - start,
+                                           field)
+            assert len(column) == end - start
+            assert list(column) == list(values[start:end])
+            positions = sorted(rand.sample(range(end - start),
+                                           (end - start) // 3))
+            assert column.take(positions).tolist() == \
+                [values[start + pos] for pos in positions]
+
+
+def test_packed_index_matches_plain():
+    """Compare intersection and scoring of packed and plain postings."""
+    tmpdir = utils.create_and_clean_testdir("tmp", "test_compress")
+    text_path = pathlib.Path(tmpdir)/"inverted_index.txt"
+    page_rank = utils.write_random_index(text_path, random.Random(485))
+    inverted_index = load_text_index(text_path)
+    doc_table = scoring.doc_table(inverted_index, page_rank)
+    bounds = blockmax.compute_bounds(inverted_index, doc_table, 4)
+
+    for block_size in (1, 4, 128):
+        packed = compress.PackedIndex(inverted_index, block_size)
+        assert list(packed) == list(inverted_index)
+        assert packed.posting_stats()["postings"] == \
+            inverted_index.posting_stats()["postings"]
+        for plain_column, packed_column in zip(inverted_index.columns(),
+                                               packed.columns()):
+            assert np.array_equal(plain_column, packed_column)
+        for plain_section, packed_section in zip(
+                inverted_index.sections()[0], packed.sections()[0]):
+            assert np.array_equal(plain_section, packed_section)
+        assert list(compress.PackedIndex(packed, block_size)) == \
+            list(inverted_index)
+
+        for query_dict in [{"alpha": 1}, {"alpha": 2, "beta": 1},
+                           {"beta": 1, "delta": 1, "gamma": 3}]:
+            plain_postings = {key: inverted_index[key] for key in query_dict}
+            packed_postings = {key: packed[key] for key in query_dict}
+            matches, positions = intersect(list(plain_postings.values()))
+            packed_matches, packed_positions = intersect(
+                list(packed_postings.values())
+            )
+            assert packed_matches == matches
+            assert [list(found) for found in packed_positions] == \
+                [list(found) for found in positions]
+            assert np.allclose(
+                scoring.tfidf_scores(
+                    query_dict, packed_postings,
+                    dict(zip(packed_postings, packed_positions)),
+                    doc_table.norms[matches],
+                ),
+                scoring.tfidf_scores(
+                    query_dict, plain_postings,
+                    dict(zip(plain_postings, positions)),
+                    doc_table.norms[matches],
+                ),
+            )
+
+            top = [
+                blockmax.top_k(query_dict, 0.3, 10, {
+                    "inverted_index": index, "doc_table": doc_table,
+                    "bounds": bounds,
+                })
+                for index in (inverted_index, packed)
+            ]
+            assert top[0][0].tolist() == top[1][0].tolist()
+            assert np.allclose(top[0][1], top[1][1])
@@ -0,0 +1,87 @@
+"""Unit tests for hits paging."""
+
+
+def test_hits_limit_offset(index_client):
+    """Verify limit and offset select a page of the full ranking."""
+    response = index_client.get("/api/v1/hits/?q=world+flags&w=0.5")
+    assert response.status_code == 200
+    hits = response.get_json()["hits"]
+    assert hits
+
+    for limit, offset in [(10, 0), (3, 2), (1, len(hits) - 1), (5, len(hits))]:
+        response = index_client.get(
+            "/api/v1/hits/?q=world+flags&w=0.5&limit={}&offset={}"
+            .format(limit, offset)
+        )
+        assert response.status_code == 200
+        page = response.get_json()["hits"]
+        assert [x["docid"] for x in page] == \
+            [x["docid"] for x in hits[offset:offset + limit]]
+
+
+def test_hits_bad_paging(index_client):
+    """Verify negative or malformed paging parameters are rejected."""
+    for paging in ("limit=-1", "offset=-1", "limit=abc", "offset=1.5"):
+        response = index_client.get("/api/v1/hits/?q=world&w=0.5&" + paging)
+        assert response.status_code == 400
+
+
+def test_hits_or_mode(index_client):
+    """Verify mode=or pages match the full disjunctive ranking."""
+    response = index_client.get("/api/v1/hits/?q=world+flags&w=0.5&mode=or")
+    assert response.status_code == 200
+    hits = response.get_json()["hits"]
+    response = index_client.get("/api/v1/hits/?q=world+flags&w=0.5")
+    assert len(hits) >= len(response.get_json()["hits"])
+
+    for limit, offset in [(10, 0), (3, 2), (5, len(hits))]:
+        response = index_client.get(
+            "/api/v1/hits/?q=world+flags&w=0.5&mode=or&limit={}&offset={}"
+            .format(limit, offset)
+        )
+        assert response.status_code == 200
+        page = response.get_json()["hits"]
+        assert [x["docid"] for x in page] == \
+            [x["docid"] for x in hits[offset:offset + limit]]
+
+
+def test_hits_bad_mode(index_client):
+    """Verify an unknown mode is rejected."""
+    response = index_client.get("/api/v1/hits/?q=world&w=0.5&mode=xor")
+    assert response.status_code == 400
+
+
+def test_hits_batch(index_client):
+    """Verify each batch result matches the single query response."""
+    queries = [
+        {"q": "world flags", "w": 0.5, "limit": 10},
+        {"q": "world flags", "w": 0.1, "limit": 5, "offset": 2},
+        {"q": "flags world", "w": 0.5},
+        {"q": "world", "w": 0.3, "limit": 3, "mode": "or"},
+        {"q": "notawordinthisindex", "w": 0.5},
+    ]
+    response = index_client.post("/api/v1/hits/batch", json=queries)
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert len(results) == len(queries)
+    for query, result in zip(queries, results):
+        response = index_client.get("/api/v1/hits/", query_string=query)
+        assert result == response.get_json()
+
+
+def test_hits_batch_bad_request(index_client):
+    """Verify invalid queries are reported without failing the batch."""
+    response = index_client.post("/api/v1/hits/batch", json={"q": "world"})
+    assert response.status_code == 400
+
+    response = index_client.post("/api/v1/hits/batch", json=[
+        {"q": "world", "w": 0.5, "limit": 1},
+        {"q": "world"},
+        {"q": "world", "w": 0.5, "mode": "xor"},
+        "world",
+    ])
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert len(results[0]["hits"]) == 1
+    assert [result.get("status_code") for result in results[1:]] == \
+        [400, 400, 400]
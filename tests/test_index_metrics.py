@@ -0,0 +1,74 @@
+"""Unit tests for the metrics endpoint."""
+import itertools
+from index import metrics, model
+
+
+def parse_metrics(text):
+    """Return {sample name with labels: value} of a metrics text."""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_histogram_lines():
+    """Verify histogram buckets are cumulative and count every value."""
+    histogram = metrics.Histogram("test_seconds", "Test.", "stage",
+                                  (0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, "parse")
+    samples = parse_metrics("\n".join(histogram.lines()))
+    assert samples == {
+        'test_seconds_bucket{stage="parse",le="0.1"}': 2,
+        'test_seconds_bucket{stage="parse",le="1.0"}': 3,
+        'test_seconds_bucket{stage="parse",le="+Inf"}': 4,
+        'test_seconds_sum{stage="parse"}': 2.65,
+        'test_seconds_count{stage="parse"}': 4,
+    }
+
+
+def test_sampled():
+    """Verify one in rate calls is sampled, and none with rate 0."""
+    counter = itertools.count(1)
+    assert [metrics.sampled(3, counter) for _ in range(6)] == \
+        [False, False, True] * 2
+    assert not any(metrics.sampled(0, counter) for _ in range(6))
+
+
+def test_metrics_route(index_client):
+    """Verify a query shows up in the stage, request and cache metrics."""
+    before = parse_metrics(
+        index_client.get("/api/v1/metrics").get_data(as_text=True)
+    )
+    response = index_client.get("/api/v1/hits/?q=world+flags+metrics&w=0.4")
+    assert response.status_code == 200
+    response = index_client.get("/api/v1/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain")
+    samples = parse_metrics(response.get_data(as_text=True))
+
+    for stage in ("parse", "serialize"):
+        key = f'index_stage_seconds_count{{stage="{stage}"}}'
+        assert samples[key] == before.get(key, 0) + 1
+    key = 'index_requests_total{route="/api/v1/hits/",status="200"}'
+    assert samples[key] == before.get(key, 0) + 1
+    assert samples['index_memory_bytes{part="postings"}'] > 0
+    assert samples['index_memory_bytes{part="doc_table"}'] > 0
+    assert 0 <= samples['index_cache_hit_ratio{cache="result"}'] <= 1
+    assert samples["index_ready"] == 1
+
+    # Uncached, the query runs every stage once
+    model.result_cache.clear()
+    model.tfidf_cache.clear()
+    before = samples
+    response = index_client.get("/api/v1/hits/?q=world+flags&w=0.4")
+    samples = parse_metrics(
+        index_client.get("/api/v1/metrics").get_data(as_text=True)
+    )
+    for stage in ("parse", "intersect", "score", "blend", "sort",
+                  "serialize"):
+        key = f'index_stage_seconds_count{{stage="{stage}"}}'
+        assert samples[key] == before.get(key, 0) + 1
+    assert samples['index_candidates_count{mode="and"}'] > 0
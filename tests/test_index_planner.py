@@ -0,0 +1,70 @@
+"""Unit tests for query planning."""
+from index import model, planner
+
+
+def test_plan_terms(index_client):
+    """Verify terms are normalized, counted and ordered rarest first."""
+    assert index_client
+    data = model.current()
+    query_plan = planner.plan("The  WORLD, world flags and the", "and", data)
+    assert query_plan.stopped == ["the", "and"]
+    assert query_plan.missing == []
+    assert sorted(query_plan.query_dict.items()) == \
+        [("flags", 1), ("world", 2)]
+    dfs = [len(posting.docs) for posting in query_plan.postings.values()]
+    assert dfs == sorted(dfs)
+    assert list(query_plan.postings) == list(query_plan.query_dict)
+
+
+def test_plan_shared_lookups(index_client):
+    """Verify plans sharing a lookups dict share their posting lists."""
+    assert index_client
+    data = model.current()
+    lookups = {}
+    first = planner.plan("world flags", "and", data, lookups)
+    second = planner.plan("world notawordinthisindex", "or", data, lookups)
+    assert set(lookups) == {"world", "flags", "notawordinthisindex"}
+    assert lookups["notawordinthisindex"] is None
+    assert second.postings["world"] is first.postings["world"]
+    assert second.missing == ["notawordinthisindex"]
+
+
+def test_plan_missing_term(index_client):
+    """Verify an unknown term empties an and plan but not an or plan."""
+    assert index_client
+    data = model.current()
+    query_plan = planner.plan("world notawordinthisindex flags", "and", data)
+    assert query_plan.query_dict == {}
+    assert query_plan.missing == ["notawordinthisindex"]
+    query_plan = planner.plan("world notawordinthisindex flags", "or", data)
+    assert sorted(query_plan.query_dict) == ["flags", "world"]
+    assert query_plan.missing == ["notawordinthisindex"]
+
+
+def test_hits_stop_words_only(index_client):
+    """Verify a query of only stop words has no hits."""
+    for query in ["the", "the and the", "a an", "   ", "!!"]:
+        for mode in ["and", "or"]:
+            response = index_client.get(
+                "/api/v1/hits/",
+                query_string={"q": query, "w": 0.5, "mode": mode},
+            )
+            assert response.status_code == 200
+            assert response.get_json() == {"hits": []}
+
+
+def test_hits_explain(index_client):
+    """Verify explain=1 adds the plan and keeps the hits."""
+    response = index_client.get("/api/v1/hits/?q=the+world+flags&w=0.5")
+    hits = response.get_json()["hits"]
+    response = index_client.get(
+        "/api/v1/hits/?q=the+world+flags&w=0.5&explain=1"
+    )
+    context = response.get_json()
+    assert context["hits"] == hits
+    plan = context["plan"]
+    assert sorted(term["term"] for term in plan["terms"]) == \
+        ["flags", "world"]
+    assert plan["terms"][0]["df"] <= plan["terms"][1]["df"]
+    assert plan["stop_words"] == ["the"]
+    assert not plan["short_circuit"]
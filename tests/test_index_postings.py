@@ -0,0 +1,48 @@
+"""Unit tests for posting list operations."""
+import random
+from index.binindex import PostingList
+from index.postings import gallop, intersect
+
+
+def make_posting(docs):
+    """Return a PostingList with the given docs."""
+    return PostingList(idf=1.0, docs=sorted(docs), tfs=[])
+
+
+def test_gallop():
+    """Verify gallop finds the first docid >= target."""
+    docids = [2, 3, 5, 8, 13, 21, 34, 55, 89]
+    for target in range(100):
+        for low in range(len(docids) + 1):
+            expected = next(
+                (pos for pos in range(low, len(docids))
+                 if docids[pos] >= target),
+                len(docids),
+            )
+            assert gallop(docids, target, low) == expected
+
+
+def test_intersect_random():
+    """Compare intersect against set intersection."""
+    rand = random.Random(485)
+    for _ in range(200):
+        postings = [
+            make_posting(rand.sample(range(500), rand.randint(1, 300)))
+            for _ in range(rand.randint(1, 4))
+        ]
+        docids, positions = intersect(postings)
+
+        expected = set(postings[0].docs)
+        for posting in postings[1:]:
+            expected &= set(posting.docs)
+        assert docids == sorted(expected)
+        for posting, found in zip(postings, positions):
+            assert [posting.docs[pos] for pos in found] == docids
+
+
+def test_intersect_empty():
+    """Verify disjoint posting lists have no matches."""
+    docids, positions = intersect([make_posting([1, 3, 5]),
+                                   make_posting([2, 4, 6])])
+    assert docids == []
+    assert positions == [[], []]
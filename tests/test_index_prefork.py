@@ -0,0 +1,126 @@
+"""Unit tests for serving the index with pre-forked workers."""
+import os
+import pathlib
+import socket
+import subprocess
+import time
+import requests
+import index
+from index import model, prefork
+
+
+def open_port():
+    """Return a port that is available for use on localhost."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_ready(url):
+    """Wait until the server at url is ready."""
+    for _ in range(300):
+        try:
+            if requests.get(url + "ready", timeout=1).status_code == 200:
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.1)
+    raise AssertionError("server did not start")
+
+
+def wait_for_workers(pid):
+    """Wait until process pid has 2 children, return how many it has."""
+    children = pathlib.Path(f"/proc/{pid}/task/{pid}/children")
+    for _ in range(100):
+        workers = len(children.read_text().split())
+        if workers == 2:
+            break
+        time.sleep(0.1)
+    return workers
+
+
+def test_prefork_workers(index_client):
+    """Verify forked workers serve the hits the app computes."""
+    port = open_port()
+    url = f"http://localhost:{port}/api/v1/"
+    env = dict(
+        os.environ, INDEX_WORKERS="2",
+        PYTHONPATH=str(pathlib.Path(index.__file__).resolve().parents[1]),
+    )
+    with subprocess.Popen(
+            ["python3", "-m", "index.prefork", "--host", "localhost",
+             "--port", str(port)],
+            env=env, stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL) as server:
+        try:
+            wait_for_ready(url)
+            assert wait_for_workers(server.pid) == 2
+
+            params = {"q": "world flags", "w": 0.5}
+            expected = index_client.get("/api/v1/hits/",
+                                        query_string=params).get_json()
+            for _ in range(4):
+                assert requests.get(url + "hits/", params=params,
+                                    timeout=10).json() == expected
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def test_prefork_reload(index_client):
+    """Verify a reload replaces the workers with forks of the new data."""
+    port = open_port()
+    url = f"http://localhost:{port}/api/v1/"
+    env = dict(
+        os.environ, INDEX_WORKERS="2",
+        PYTHONPATH=str(pathlib.Path(index.__file__).resolve().parents[1]),
+    )
+    path = index.app.config["PAGERANK_FILENAME"]
+    stat = os.stat(path)
+    with subprocess.Popen(
+            ["python3", "-m", "index.prefork", "--host", "localhost",
+             "--port", str(port)],
+            env=env, stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL) as server:
+        try:
+            wait_for_ready(url)
+            assert wait_for_workers(server.pid) == 2
+            version = requests.get(url + "ready", timeout=1).json()["version"]
+
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+            # The worker answering is shut down by the reload, so don't
+            # keep its connection open
+            response = requests.post(url + "reload", timeout=1,
+                                     headers={"Connection": "close"})
+            assert response.status_code == 202
+            response = requests.post(url + "reload", timeout=1,
+                                     headers={"Connection": "close"})
+            assert response.status_code == 409
+            for _ in range(300):
+                status = requests.get(url + "ready", timeout=1).json()
+                if status["version"] > version:
+                    break
+                time.sleep(0.1)
+            assert status["version"] == version + 1
+
+            params = {"q": "world flags", "w": 0.5}
+            expected = index_client.get("/api/v1/hits/",
+                                        query_string=params).get_json()
+            assert requests.get(url + "hits/", params=params,
+                                timeout=10).json() == expected
+        finally:
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            server.terminate()
+            server.wait()
+
+
+def test_prefork_reload_pending(index_client):
+    """Verify a worker's reload is refused while the master reloads."""
+    model.prefork["request_reload"] = prefork.request_reload
+    prefork.reload_pending.value = 1
+    try:
+        response = index_client.post("/api/v1/reload")
+        assert response.status_code == 409
+    finally:
+        model.prefork["request_reload"] = None
+        prefork.reload_pending.value = 0
@@ -0,0 +1,49 @@
+"""Unit tests for profiling hits requests."""
+import index
+
+
+def test_profile_hits(index_client):
+    """Verify profile=1 returns the hits and the profiled functions."""
+    url = "/api/v1/hits/?q=world+flags&w=0.5"
+    hits = index_client.get(url).get_json()["hits"]
+    response = index_client.get(url + "&profile=1")
+    assert response.status_code == 200
+    context = response.get_json()
+    assert context["hits"] == hits
+
+    # The cached hits are not used, so the report shows the query's work
+    functions = context["profile"]["functions"]
+    assert 0 < len(functions) <= index.app.config["PROFILE_TOP_FUNCTIONS"]
+    assert any("intersect" in function["function"] for function in functions)
+    cumulative = [function["cumulative_seconds"] for function in functions]
+    assert cumulative == sorted(cumulative, reverse=True)
+
+
+def test_profile_admin_only(index_client):
+    """Verify profiling requires the admin token when one is set."""
+    index.app.config["INDEX_ADMIN_TOKEN"] = "secret"
+    try:
+        url = "/api/v1/hits/?q=world&w=0.5&profile=1"
+        assert index_client.get(url).status_code == 403
+        assert index_client.get("/api/v1/profiles").status_code == 403
+        response = index_client.get(url,
+                                    headers={"X-Admin-Token": "secret"})
+        assert response.status_code == 200
+    finally:
+        index.app.config["INDEX_ADMIN_TOKEN"] = None
+
+
+def test_profile_sampling(index_client):
+    """Verify sampled requests are stored for /api/v1/profiles."""
+    before = len(index_client.get("/api/v1/profiles").get_json()["profiles"])
+    index.app.config["PROFILE_SAMPLE_RATE"] = 1
+    try:
+        response = index_client.get("/api/v1/hits/?q=world+flags&w=0.2")
+    finally:
+        index.app.config["PROFILE_SAMPLE_RATE"] = 0
+    assert "profile" not in response.get_json()
+    profiles = index_client.get("/api/v1/profiles").get_json()["profiles"]
+    assert len(profiles) == min(before + 1,
+                                index.app.config["PROFILE_KEEP"])
+    assert profiles[-1]["request"] == "/api/v1/hits/?q=world+flags&w=0.2"
+    assert profiles[-1]["functions"]
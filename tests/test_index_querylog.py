@@ -0,0 +1,36 @@
+"""Unit tests for the structured query log."""
+import json
+import utils
+import index
+from index import querylog
+
+
+def test_query_log(index_client):
+    """Verify sampled hits requests are written as lines of JSON."""
+    tmpdir = utils.create_and_clean_testdir("tmp", "test_querylog")
+    filename = tmpdir/"queries.jsonl"
+    index.app.config["QUERY_LOG_FILENAME"] = str(filename)
+    index.app.config["QUERY_LOG_SAMPLE_RATE"] = 2
+    querylog.stop()
+    querylog.start()
+    try:
+        for weight in ("0.1", "0.1", "0.2", "0.3"):
+            response = index_client.get(
+                f"/api/v1/hits/?q=world+flags&w={weight}&limit=3"
+            )
+            assert response.status_code == 200
+    finally:
+        querylog.stop()
+        index.app.config["QUERY_LOG_FILENAME"] = None
+        index.app.config["QUERY_LOG_SAMPLE_RATE"] = 1
+
+    records = [json.loads(line) for line in
+               filename.read_text(encoding="utf-8").splitlines()]
+    assert len(records) == 2
+    for record in records:
+        assert record["query"] == "world flags"
+        assert record["mode"] == "and"
+        assert record["limit"] == 3
+        assert record["hits"] == 3
+        assert record["latency_ms"] >= 0
+        assert record["cache"] in ("result", "tfidf", "miss")
@@ -0,0 +1,12 @@
+"""Unit tests for index server startup."""
+
+
+def test_ready(index_client):
+    """Verify the index is loaded before the first query."""
+    response = index_client.get("/api/v1/ready")
+    assert response.status_code == 200
+    status = response.get_json()
+    assert status["ready"]
+    assert status["error"] is None
+    assert status["terms"] > 0
+    assert status["documents"] > 0
@@ -0,0 +1,102 @@
+"""Unit tests for hot reloading the index data."""
+import os
+import time
+import index
+from index import model
+
+
+def wait_for_reload(index_client, version):
+    """Wait until the data version is past version, return the status."""
+    for _ in range(300):
+        status = index_client.get("/api/v1/ready").get_json()
+        if status["version"] > version and not status["reloading"]:
+            return status
+        time.sleep(0.1)
+    raise AssertionError("reload did not finish")
+
+
+def test_reload(index_client):
+    """Verify a reload swaps in new data and keeps serving the same hits."""
+    url = "/api/v1/hits/?q=world+flags&w=0.5"
+    hits = index_client.get(url).get_json()["hits"]
+    old_data = model.current()
+
+    response = index_client.post("/api/v1/reload")
+    assert response.status_code == 202
+    status = wait_for_reload(index_client, old_data["version"])
+    assert status["ready"]
+    assert status["error"] is None
+    assert model.current() is not old_data
+    assert index_client.get(url).get_json()["hits"] == hits
+
+
+def test_reload_error_keeps_data(index_client):
+    """Verify a failed reload keeps serving the previous data."""
+    url = "/api/v1/hits/?q=world+flags&w=0.5"
+    hits = index_client.get(url).get_json()["hits"]
+    old_data = model.current()
+    filename = index.app.config["PAGERANK_FILENAME"]
+    index.app.config["PAGERANK_FILENAME"] = "missing/pagerank.out"
+    try:
+        model.reload()
+    finally:
+        index.app.config["PAGERANK_FILENAME"] = filename
+    assert model.current() is old_data
+    status = index_client.get("/api/v1/ready").get_json()
+    assert status["error"] is not None
+    assert index_client.get(url).get_json()["hits"] == hits
+
+    model.reload()
+    assert index_client.get("/api/v1/ready").get_json()["error"] is None
+
+
+def test_reload_after_failed_start(index_client):
+    """Verify a server that failed to load becomes ready after a reload."""
+    url = "/api/v1/hits/?q=world+flags&w=0.5"
+    filename = index.app.config["PAGERANK_FILENAME"]
+    index.app.config["PAGERANK_FILENAME"] = "missing/pagerank.out"
+    model.status["loaded"] = False
+    model.status["ready"] = False
+    try:
+        model.reload()
+        assert index_client.get("/api/v1/ready").status_code == 503
+        assert index_client.get(url).status_code == 503
+    finally:
+        index.app.config["PAGERANK_FILENAME"] = filename
+
+    model.reload()
+    assert index_client.get("/api/v1/ready").status_code == 200
+    assert index_client.get(url).status_code == 200
+
+
+def test_reload_changed_only(index_client):
+    """Verify the files read by a manual reload aren't read again."""
+    assert index_client
+    path = index.app.config["PAGERANK_FILENAME"]
+    stat = os.stat(path)
+    try:
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        model.reload()
+        version = model.current()["version"]
+        model.reload(changed_only=True)
+        assert model.current()["version"] == version
+
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2))
+        model.reload(changed_only=True)
+        assert model.current()["version"] == version + 1
+    finally:
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+def test_reload_admin_only(index_client):
+    """Verify the reload route requires the admin token when one is set."""
+    index.app.config["INDEX_ADMIN_TOKEN"] = "secret"
+    try:
+        response = index_client.post("/api/v1/reload")
+        assert response.status_code == 403
+        response = index_client.post(
+            "/api/v1/reload", headers={"X-Admin-Token": "wrong"}
+        )
+        assert response.status_code == 403
+    finally:
+        index.app.config["INDEX_ADMIN_TOKEN"] = None
@@ -0,0 +1,76 @@
+"""Unit tests for vectorized scoring."""
+import math
+import random
+import numpy as np
+import pytest
+from index.binindex import PostingList
+from index.postings import intersect
+from index.scoring import (
+    rank_column, tfidf_scores, top_k, weighted_scores
+)
+
+
+def reference_score(query_dict, weight, postings, doc_id, norm_d, rank):
+    """Score one document the way the original loop did."""
+    query_vector = []
+    document_vector = []
+    for key, count in query_dict.items():
+        posting = postings[key]
+        position = list(posting.docs).index(doc_id)
+        query_vector.append(count * posting.idf)
+        document_vector.append(posting.tfs[position] * posting.idf)
+    dot = sum(x * y for x, y in zip(query_vector, document_vector))
+    norm_q = math.sqrt(sum(x * x for x in query_vector))
+    tfidf = dot / (norm_q * math.sqrt(norm_d))
+    return weight * rank + (1 - weight) * tfidf
+
+
+def test_scores_match_reference():
+    """Compare vectorized scores with the per-document computation."""
+    rand = random.Random(485)
+    docids = list(range(1, 200))
+    norms = {doc_id: rand.uniform(1, 50) for doc_id in docids}
+    page_rank = {doc_id: rand.uniform(0, 0.01) for doc_id in docids}
+    postings = {}
+    for key in ("alpha", "beta", "gamma"):
+        matches = sorted(rand.sample(docids, 120))
+        postings[key] = PostingList(
+            idf=rand.uniform(0.1, 2),
+            docs=matches,
+            tfs=[rand.randint(1, 9) for _ in matches],
+        )
+    query_dict = {"alpha": 2, "beta": 1, "gamma": 1}
+
+    matches, positions = intersect(list(postings.values()))
+    tfidf = tfidf_scores(
+        query_dict, postings, dict(zip(postings, positions)),
+        np.sqrt([norms[doc_id] for doc_id in matches]),
+    )
+    ranks = rank_column(np.array(matches), page_rank)
+    for weight in (0, 0.3, 1):
+        scores = weighted_scores(weight, tfidf, ranks)
+        for doc_id, score in zip(matches, scores):
+            assert score == pytest.approx(reference_score(
+                query_dict, weight, postings, doc_id, norms[doc_id],
+                page_rank[doc_id],
+            ))
+
+
+def test_rank_column_missing_docs():
+    """Verify docs without a PageRank get 0."""
+    page_rank = {3: 0.5, 1: 0.25, 8: 0.125}
+    assert rank_column(np.array([1, 2, 3, 8, 9]), page_rank).tolist() == \
+        [0.25, 0, 0.5, 0.125, 0]
+    assert rank_column(np.array([1, 2]), {}).tolist() == [0, 0]
+
+
+def test_top_k_prefix():
+    """Verify top_k returns a prefix of the full ranking, ties included."""
+    rand = random.Random(485)
+    scores = np.array([rand.choice([0.1, 0.2, 0.3, rand.random()])
+                       for _ in range(100)])
+    ranking = top_k(scores).tolist()
+    assert [scores[item] for item in ranking] == \
+        sorted(scores, reverse=True)
+    for k in (0, 1, 5, 50, 99, 100, 200):
+        assert top_k(scores, k).tolist() == ranking[:k]
@@ -0,0 +1,67 @@
+"""Unit tests for document range sharding."""
+import pathlib
+import random
+import utils
+from index import blockmax, model, scoring, shards
+from index.binindex import load_text_index
+
+
+def test_doc_ranges_cover_docs():
+    """Verify shard ranges split the docs into contiguous even parts."""
+    docids = random.Random(485).sample(range(1, 10 ** 6), 1000)
+    for count in (1, 2, 3, 7):
+        ranges = [shards.doc_range(docids, number, count)
+                  for number in range(count)]
+        assert ranges[0][0] == 0
+        for (_, high), (low, _) in zip(ranges, ranges[1:]):
+            assert high == low
+        sizes = [sum(low <= doc_id < high for doc_id in docids)
+                 for low, high in ranges]
+        assert sum(sizes) == len(docids)
+        assert max(sizes) - min(sizes) <= 1
+
+    # Without docids the ranges still cover every docid, once
+    assert [shards.doc_range([], number, 3) for number in range(3)] == \
+        [(0, 0), (0, 0), (0, 2 ** 32)]
+
+
+def top_hits(inverted_index, page_rank, query_dict, weight, k):
+    """Return the top k hits of a mode=or query as the API would."""
+    doc_table = scoring.doc_table(inverted_index, page_rank)
+    index_data = {
+        "inverted_index": inverted_index,
+        "doc_table": doc_table,
+        "bounds": blockmax.compute_bounds(inverted_index, doc_table, 8),
+    }
+    docids, scores = blockmax.top_k(query_dict, weight, k, index_data)
+    return [{"docid": doc_id, "score": score}
+            for doc_id, score in zip(docids.tolist(), scores.tolist())]
+
+
+def test_sharded_hits_match_unsharded():
+    """Merge the top hits of every shard and compare with one index."""
+    tmpdir = utils.create_and_clean_testdir("tmp", "test_shards")
+    text_path = pathlib.Path(tmpdir)/"inverted_index.txt"
+    page_rank = utils.write_random_index(text_path, random.Random(485))
+    inverted_index = load_text_index(text_path)
+
+    for count in (2, 3):
+        # Split by the index's docids, as the shard servers do
+        shard_indexes = [model.select_shard(inverted_index, number, count)
+                         for number in range(count)]
+        assert sum(len(posting.docs)
+                   for shard_index in shard_indexes
+                   for posting in shard_index.values()) == \
+            sum(len(posting.docs) for posting in inverted_index.values())
+
+        for query_dict in [{"alpha": 1}, {"beta": 2, "gamma": 1}]:
+            for weight in (0, 0.5):
+                expected = top_hits(inverted_index, page_rank, query_dict,
+                                    weight, 25)
+                for offset, limit in [(0, 10), (5, 5), (15, 10)]:
+                    assert shards.merge_hits(
+                        [top_hits(shard_index, page_rank, query_dict,
+                                  weight, offset + limit)
+                         for shard_index in shard_indexes],
+                        offset, limit,
+                    ) == expected[offset:offset + limit]
@@ -0,0 +1,78 @@
+"""Unit tests for the asynchronous search server."""
+import asyncio
+import aiohttp
+import pytest
+from search import asgi, pagecache
+
+
+async def get(path, query_string, method="GET"):
+    """Send a request to the ASGI app, return the status and body."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "root_path": "",
+        "query_string": query_string.encode(), "headers": [],
+        "server": ("localhost", 8000), "client": ("localhost", 1234),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await asgi.app(scope, receive, send)
+    return messages[0]["status"], b"".join(
+        message.get("body", b"") for message in messages[1:]
+    )
+
+
+async def get_all(requests):
+    """Send the (path, query_string) requests concurrently."""
+    try:
+        return await asyncio.gather(*(get(*request) for request in requests))
+    finally:
+        await asgi.close()
+
+
+def test_asgi_matches_flask(search_client):
+    """Verify concurrent async searches render the Flask app's pages."""
+    searches = ["q=world+flags&w=0.5", "q=ocean&w=0", "q=nosuchword&w=1"]
+    responses = asyncio.run(get_all([("/", query) for query in searches * 5]))
+    for query, (status, body) in zip(searches * 5, responses):
+        assert status == 200
+        assert body == search_client.get("/?" + query).data
+
+    # Requests that aren't searches are served by the Flask app
+    responses = asyncio.run(get_all([
+        ("/", "q=ocean"), ("/static/css/style.css", ""),
+    ]))
+    assert responses[0][0] == 400
+    assert responses[1] == (200, search_client.get(
+        "/static/css/style.css").data)
+
+
+def test_asgi_page_cache(search_client):
+    """Verify async searches are served from the page cache."""
+    assert search_client
+    fresh = pagecache.page_cache.stats().get("fresh", 0)
+    first = asyncio.run(get_all([("/", "q=world+flags&w=0.41")]))
+    second = asyncio.run(get_all([("/", "q=World++flags&w=0.410")]))
+    assert first == second
+    assert pagecache.page_cache.stats()["fresh"] == fresh + 1
+
+
+def test_asgi_head(search_client):
+    """Verify a HEAD search gets the headers of the page without a body."""
+    assert search_client
+    status, body = asyncio.run(get_all([("/", "q=world+flags&w=0.5",
+                                         "HEAD")]))[0]
+    assert (status, body) == (200, b"")
+
+
+def test_asgi_index_error(search_client):
+    """Verify an error of the index server fails the search."""
+    assert search_client
+    with pytest.raises(aiohttp.ClientResponseError) as error:
+        asyncio.run(get_all([("/", "q=world&w=abc")]))
+    assert error.value.status == 400
@@ -0,0 +1,68 @@
+"""Unit tests for the search server document cache."""
+import utils
+from search import model
+from search.cache import DocumentCache, row_size
+
+
+def make_row(docid, summary=""):
+    """Return a Documents row for docid."""
+    return {"docid": docid, "title": f"title {docid}", "summary": summary,
+            "url": ""}
+
+
+def test_document_cache_evicts_by_size():
+    """Verify the least recently used rows go once the bound is reached."""
+    size = row_size(make_row(1))
+    cache = DocumentCache(3 * size)
+    for docid in (1, 2, 3):
+        cache.put(make_row(docid))
+    assert set(cache.get_many([1])) == {1}
+    cache.put(make_row(4))
+    assert set(cache.get_many([1, 2, 3, 4])) == {1, 3, 4}
+
+    # A row bigger than the whole cache is not cached
+    cache.put(make_row(5, "x" * 4 * size))
+    assert cache.get_many([5]) == {}
+    stats = cache.stats()
+    assert stats["size"] == 3
+    assert stats["bytes"] <= stats["maxbytes"]
+    assert (stats["hits"], stats["misses"]) == (4, 2)
+
+
+def test_lookup_documents_cached(search_app):
+    """Verify rows looked up once are served by the cache."""
+    with search_app.app_context():
+        connection = model.get_db()
+        docids = [row["docid"] for row in connection.execute(
+            "SELECT docid FROM Documents ORDER BY docid LIMIT 5"
+        )]
+        expected = model.lookup_documents(connection, docids)
+        hits = model.document_cache.stats()["hits"]
+        assert model.lookup_documents(connection, docids[::-1]) == \
+            expected[::-1]
+        assert model.document_cache.stats()["hits"] == hits + len(docids)
+
+
+def test_preload_documents(search_app):
+    """Verify the top documents by PageRank are preloaded."""
+    with search_app.app_context():
+        docids = [row["docid"] for row in model.get_db().execute(
+            "SELECT docid FROM Documents ORDER BY docid DESC LIMIT 4"
+        )]
+    tmpdir = utils.create_and_clean_testdir("tmp", "test_search_cache")
+    pagerank = tmpdir/"pagerank.out"
+    pagerank.write_text("".join(
+        f"{docid},{rank}\n" for rank, docid in enumerate(docids)
+    ), encoding="utf-8")
+
+    config = search_app.config
+    saved = model.document_cache, config["PAGERANK_FILENAME"]
+    model.document_cache = DocumentCache(config["SEARCH_DOC_CACHE_BYTES"])
+    config["SEARCH_DOC_CACHE_PRELOAD"] = 2
+    config["PAGERANK_FILENAME"] = pagerank
+    try:
+        model.preload_documents()
+        assert set(model.document_cache.get_many(docids)) == set(docids[2:])
+    finally:
+        model.document_cache, config["PAGERANK_FILENAME"] = saved
+        config["SEARCH_DOC_CACHE_PRELOAD"] = 0
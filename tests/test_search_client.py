@@ -0,0 +1,36 @@
+"""Unit tests for the search server's client to the index server."""
+from search import pagecache
+
+
+def test_client_stats(search_client):
+    """Verify searches are counted in the connection stats."""
+    before = search_client.get("/api/v1/stats").get_json()["index_client"]
+    for weight in ("0.11", "0.12", "0.13"):
+        response = search_client.get("/?q=world+flags&w=" + weight)
+        assert response.status_code == 200
+    stats = search_client.get("/api/v1/stats").get_json()["index_client"]
+    assert stats["requests"] == before["requests"] + 3
+    assert before["connections"] <= stats["connections"] <= stats["requests"]
+    assert 0 <= stats["reuse_ratio"] < 1
+
+
+def test_client_encodes_query(search_client):
+    """Verify query characters reach the index server URL encoded."""
+    # Without the page cache, both searches reach the index server
+    saved = pagecache.page_cache
+    pagecache.page_cache = pagecache.PageCache(0)
+    try:
+        expected = search_client.get("/?q=world+flags&w=0.5").data
+        assert b"<a" in expected
+
+        # Sent as is, & and # would cut the query short
+        before = search_client.get("/api/v1/stats").get_json()
+        response = search_client.get(
+            "/", query_string={"q": "world #&flags", "w": "0.5"}
+        )
+        stats = search_client.get("/api/v1/stats").get_json()
+    finally:
+        pagecache.page_cache = saved
+    assert stats["index_client"]["requests"] == \
+        before["index_client"]["requests"] + 1
+    assert response.data == expected
@@ -0,0 +1,30 @@
+"""Unit tests for the search server database lookups."""
+import sqlite3
+import pytest
+from search import model
+
+
+def test_lookup_documents(search_app):
+    """Verify rows come back in hit order and missing docids are skipped."""
+    with search_app.app_context():
+        connection = model.get_db()
+        docids = [row["docid"] for row in connection.execute(
+            "SELECT docid FROM Documents ORDER BY docid LIMIT 3"
+        )]
+        hit_order = [docids[2], -1, docids[0], docids[1]]
+        rows = model.lookup_documents(connection, hit_order)
+        assert [row["docid"] for row in rows] == \
+            [docids[2], docids[0], docids[1]]
+        assert all(set(row) == {"docid", "title", "summary", "url"}
+                   for row in rows)
+        assert model.lookup_documents(connection, []) == []
+
+
+def test_read_only_pool(search_app):
+    """Verify connections are read-only and reused across requests."""
+    with search_app.app_context():
+        connection = model.get_db()
+        with pytest.raises(sqlite3.OperationalError):
+            connection.execute("DELETE FROM Documents")
+    with search_app.app_context():
+        assert model.get_db() is connection
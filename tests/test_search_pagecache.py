@@ -0,0 +1,73 @@
+"""Unit tests for the search server results page cache."""
+import time
+import search
+from search import pagecache
+
+
+def index_requests(search_client):
+    """Return how many requests the search server sent the index server."""
+    stats = search_client.get("/api/v1/stats").get_json()
+    return stats["index_client"]["requests"]
+
+
+def test_page_cache_fresh(search_client):
+    """Verify a repeated search is served without the index server."""
+    page = search_client.get("/?q=world+flags&w=0.31").data
+    before = index_requests(search_client)
+    assert search_client.get("/?q=World++flags!&w=0.310").data == page
+    assert index_requests(search_client) == before
+
+
+def test_page_cache_stale(search_client):
+    """Verify stale pages are served and rendered again in the background."""
+    config = search.app.config
+    page = search_client.get("/?q=world+flags&w=0.32").data
+    config["SEARCH_PAGE_CACHE_TTL"] = 0
+    try:
+        refreshed = pagecache.page_cache.stats().get("refreshed", 0)
+        assert search_client.get("/?q=world+flags&w=0.32").data == page
+        for _ in range(100):
+            if pagecache.page_cache.stats().get("refreshed") == \
+                    refreshed + 1:
+                break
+            time.sleep(0.05)
+        else:
+            raise AssertionError("page was not refreshed")
+    finally:
+        config["SEARCH_PAGE_CACHE_TTL"] = 60
+
+
+def test_page_cache_fallback(search_client):
+    """Verify the old page is served when the index server is down."""
+    config = search.app.config
+    page = search_client.get("/?q=world+flags&w=0.33").data
+    url = config["INDEX_API_URL"]
+    config["INDEX_API_URL"] = "http://localhost:9/api/v1/hits/"
+    config["SEARCH_PAGE_CACHE_TTL"] = 0
+    config["SEARCH_PAGE_CACHE_STALE"] = 0
+    try:
+        fallbacks = pagecache.page_cache.stats().get("fallback", 0)
+        assert search_client.get("/?q=world+flags&w=0.33").data == page
+        assert pagecache.page_cache.stats()["fallback"] == fallbacks + 1
+    finally:
+        config["INDEX_API_URL"] = url
+        config["SEARCH_PAGE_CACHE_TTL"] = 60
+        config["SEARCH_PAGE_CACHE_STALE"] = 600
+
+
+def test_page_cache_refresh_error(search_client, caplog):
+    """Verify a failed refresh is logged and the page can refresh again."""
+    assert search_client
+    cache = pagecache.PageCache(10)
+
+    def fail():
+        raise RuntimeError("template error")
+
+    cache.refresh("key", fail, [])
+    cache.refresh("key", lambda: "page", [])
+    for _ in range(100):
+        if cache.get("key") is None:
+            time.sleep(0.05)
+            cache.refresh("key", lambda: "page", [])
+    assert cache.get("key")[0] == "page"
+    assert "template error" in caplog.text
@@ -70,6 +70,22 @@ def parse_inverted_index_line(line):
     return term, idf, docs
 
 
+def write_random_index(path, rand):
+    """Write a random text inverted index and return its PageRank."""
+    docids = list(range(1, 400))
+    norms = {doc_id: rand.uniform(1, 50) for doc_id in docids}
+    page_rank = {doc_id: rand.paretovariate(1.5) / 1000 for doc_id in docids}
+    with path.open("w") as outfile:
+        for term, size in [("alpha", 300), ("beta", 120), ("delta", 3),
+                           ("gamma", 40)]:
+            postings = " ".join(
+                f"{doc_id} {rand.randint(1, 9)} {norms[doc_id]}"
+                for doc_id in sorted(rand.sample(docids, size))
+            )
+            outfile.write(f"{term} {rand.uniform(0.1, 2)} {postings}\n")
+    return page_rank
+
+
 def assert_compare_inverted_indexes(path1, path2):
     """Compare two inverted index files, raising an assertion if different."""
     # Read files into memory
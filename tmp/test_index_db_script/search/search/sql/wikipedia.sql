@@ -0,0 +1,7 @@
+CREATE TABLE Documents (docid INT, title VARCHAR(100), categories VARCHAR(5000), image VARCHAR(1000), summary VARCHAR(10000), PRIMARY KEY (docid));
+INSERT INTO Documents (docid, title, categories, image, summary) VALUES
+(18629286, 'Human trafficking in Suriname', 'All NPOV disputes, Human rights in Suriname, Human trafficking by country, NPOV disputes from May 2008', 'http://upload.wikimedia.org/wikipedia/commons/thumb/f/fe/Unbalanced_scales.svg/45px-Unbalanced_scales.svg.png', '');
+INSERT INTO Documents (docid, title, categories, image, summary) VALUES
+(3646972, 'England, My England and Other Stories', '1922 short story collections, Short story collection stubs, Short story collections by D. H. Lawrence', 'http://upload.wikimedia.org/wikipedia/commons/thumb/7/71/Nuvola_apps_kwrite.png/40px-Nuvola_apps_kwrite.png', '');
+INSERT INTO Documents (docid, title, categories, image, summary) VALUES
+(31625462, 'Zachary Barth', 'All articles lacking reliable references, All articles with unsourced statements, Articles lacking reliable references from May 2011, Articles with unsourced statements from March 2012, Living people, Persondata templates without short description parameter, Rensselaer Polytechnic Institute alumni, Video game developers, Year of birth missing (living people)', 'http://bits.wikimedia.org/skins-1.19/vector/images/search-ltr.png?303-4', '');